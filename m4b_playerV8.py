@@ -1,9 +1,25 @@
 #!/usr/bin/env python3
-import sys, os, json, base64, subprocess
+import sys, os, json, base64, subprocess, re
 from pathlib import Path
 import shutil
 import math
 import collections
+import struct
+import time
+import datetime
+import gzip
+import itertools
+import hashlib
+import mmap
+import tempfile
+import threading
+import concurrent.futures
+import queue
+import heapq
+import bisect
+import weakref
+import multiprocessing
+from multiprocessing import shared_memory
 try:
     import psutil  # optional resource monitoring
 except ImportError:  # pragma: no cover - optional dependency
@@ -35,8 +51,12 @@ import pyttsx3  # for text-to-speech
 
 # --- CONFIG & UTILITIES ---
 HOME = Path.home()
-CONFIG_DIR = HOME / '.config' / 'm4bplayer'
+CONFIG_DIR = Path(os.environ.get('M4BPLAYER_CONFIG_DIR') or HOME / '.config' / 'm4bplayer')
 RESUME_DB = CONFIG_DIR / 'resume.dat'
+SESSION_LOG = CONFIG_DIR / 'sessions.log'
+SESSION_BOOKS = CONFIG_DIR / 'sessions.books'
+CACHE_DIR = CONFIG_DIR / 'cache'
+ENVELOPE_DIR = CONFIG_DIR / 'envelopes'
 CONFIG_DIR.mkdir(parents=True, exist_ok=True)
 
 def _log_exception(exctype, value, tb):
@@ -100,6 +120,1574 @@ def find_icon():
             return p
     return None
 
+def fmt_ms(ms):
+    s = int(ms) // 1000
+    return f"{s//3600:02d}:{(s%3600)//60:02d}:{s%60:02d}"
+
+def speak(text, cancel=None):
+    """Read ``text`` aloud, stopping at the next word once ``cancel`` is set."""
+    if sys.platform == 'win32':
+        import comtypes  # SAPI needs COM set up on the speaking thread
+        comtypes.CoInitialize()
+    engine = pyttsx3.init()
+    if cancel is not None:
+        engine.connect('started-word', lambda *_: cancel.is_set() and engine.stop())
+    engine.say(text)
+    engine.runAndWait()
+
+# --- Resource tracking ----------------------------------------------------
+
+class ResourceRegistry:
+    """Keep count of native handles, threads, timers and child processes.
+
+    libvlc objects are reference counted outside Python, so they are counted
+    explicitly on create/release.  Python-side objects (threads, processes,
+    shared-memory rings) are held weakly and counted while still alive.
+    """
+
+    def __init__(self):
+        self.native = collections.Counter()
+        self.objects = collections.defaultdict(weakref.WeakSet)
+        self.lock = threading.Lock()
+
+    def new_media(self, inst, mrl):
+        with self.lock:
+            self.native['vlc.Media'] += 1
+        return inst.media_new(mrl)
+
+    def release_media(self, media):
+        if media is not None:
+            media.release()
+            with self.lock:
+                self.native['vlc.Media'] -= 1
+
+    def new_player(self, inst):
+        with self.lock:
+            self.native['vlc.MediaPlayer'] += 1
+        return inst.media_player_new()
+
+    def release_player(self, player):
+        player.release()
+        with self.lock:
+            self.native['vlc.MediaPlayer'] -= 1
+
+    def track(self, kind, obj):
+        self.objects[kind].add(obj)
+        return obj
+
+    def report(self):
+        """Return ``{name: live count}`` for everything being tracked."""
+        out = {k: v for k, v in self.native.items()}
+        for kind, objs in self.objects.items():
+            out[kind] = len(objs)
+        app = QtWidgets.QApplication.instance()
+        if app is not None:
+            out['QWidget'] = len(app.allWidgets())
+            out['QTimer'] = len(app.findChildren(QtCore.QTimer)) + sum(
+                len(w.findChildren(QtCore.QTimer)) for w in app.topLevelWidgets())
+        out['Python threads'] = threading.active_count()
+        if psutil:
+            out['Child processes'] = len(psutil.Process().children(recursive=True))
+        else:
+            out['Child processes'] = len(multiprocessing.active_children())
+        return out
+
+
+RESOURCES = ResourceRegistry()
+
+# --- Background jobs ------------------------------------------------------
+
+PRIORITY_CURRENT = 0      # the book being listened to
+PRIORITY_PREFETCH = 1     # books coming up next: parsing, caching
+PRIORITY_MAINTENANCE = 2  # library-wide work: relinking, exports
+PRIORITY_NAMES = {PRIORITY_CURRENT: 'current', PRIORITY_PREFETCH: 'prefetch',
+                  PRIORITY_MAINTENANCE: 'maintenance'}
+
+
+class CancelToken:
+    """A cancel flag that also reads as set once its parent (a book's token) is."""
+
+    def __init__(self, parent=None):
+        self.parent = parent
+        self._set = False
+
+    def set(self):
+        self._set = True
+
+    def is_set(self):
+        return self._set or (self.parent is not None and self.parent.is_set())
+
+
+class Job:
+    """One piece of work queued on a ``JobScheduler``."""
+
+    def __init__(self, scheduler, fn, args, priority, book, resources, process, token):
+        self.scheduler = scheduler
+        self.fn, self.args = fn, args
+        self.priority = priority
+        self.book = book
+        self.resources = resources
+        self.process = process
+        self.token = token
+        self.cancellable = False
+        self.on_done = self.on_error = self.on_cancel = self.on_progress = None
+        self.result = None
+        self.error = None
+        self.submitted = time.monotonic()
+        self.started = self.finished = None
+        self._done = threading.Event()
+
+    @property
+    def cancelled(self):
+        return self.token.is_set()
+
+    def cancel(self):
+        self.token.set()
+        self.scheduler.purge()
+
+    def wait(self, timeout=None):
+        return self._done.wait(timeout)
+
+
+class JobScheduler(QtCore.QObject):
+    """Run background work by priority on one shared pool of worker threads.
+
+    A queued job starts once a worker is free and each resource it names
+    (``disk``, ``ffmpeg``, ``tts``) is under its concurrency limit; among
+    those the highest priority, oldest job goes first. One worker is kept
+    for current-book work so long prefetch or maintenance jobs cannot hold
+    it up. Picklable CPU-bound functions can run in a process pool with
+    ``process=True``.
+
+    Jobs tagged with a ``book`` share that book's cancel token, so
+    ``cancel_book`` drops everything queued or running for it. Callbacks run
+    on the GUI thread; ``on_done`` is skipped for a job cancelled in the
+    meantime and ``on_cancel`` receives whatever it returned instead.
+    """
+
+    _finished = QtCore.pyqtSignal(object)
+    _progressed = QtCore.pyqtSignal(object, object)
+
+    def __init__(self, workers=4, limits=None, history=256):
+        super().__init__()
+        self.workers = max(2, workers)
+        self.limits = {'disk': 2, 'ffmpeg': os.cpu_count() or 2, 'tts': 1}
+        self.limits.update(limits or {})
+        self.in_use = collections.Counter()
+        self.heap = []
+        self.seq = itertools.count()
+        self.tokens = {}
+        self.running = set()
+        self.cond = threading.Condition()
+        self.waits = collections.deque(maxlen=history)
+        self.runs = collections.deque(maxlen=history)
+        self.counts = collections.Counter()
+        self.pool = None
+        self.closing = False
+        qc = QtCore.Qt.ConnectionType.QueuedConnection
+        self._finished.connect(self._deliver, qc)
+        self._progressed.connect(self._report, qc)
+        self.threads = [threading.Thread(target=self._work, name=f"job-worker-{i}", daemon=True)
+                        for i in range(self.workers)]
+        for t in self.threads:
+            t.start()
+
+    def token(self, book):
+        tok = self.tokens.get(book)
+        if tok is None or tok.is_set():
+            tok = self.tokens[book] = CancelToken()
+        return tok
+
+    def submit(self, fn, *args, priority=PRIORITY_MAINTENANCE, book=None, resources=(),
+               process=False, cancellable=False, on_done=None, on_error=None,
+               on_cancel=None, on_progress=None):
+        """Queue ``fn(*args)`` and return its ``Job``.
+
+        ``resources`` lists the limited resources the job uses, or maps them
+        to a number of units. With ``cancellable`` the job's token is passed
+        as ``cancel=``; with ``on_progress`` a ``progress=`` callback is
+        passed whose arguments are forwarded to ``on_progress``. Neither is
+        passed to process jobs.
+        """
+        if not isinstance(resources, dict):
+            resources = dict.fromkeys(resources, 1)
+        resources = {r: min(n, self.limits.get(r, n)) for r, n in resources.items()}
+        job = Job(self, fn, args, priority, book, resources, process,
+                  CancelToken(self.token(book) if book else None))
+        job.cancellable = cancellable and not process
+        job.on_done, job.on_error, job.on_cancel = on_done, on_error, on_cancel
+        job.on_progress = on_progress
+        with self.cond:
+            heapq.heappush(self.heap, (priority, next(self.seq), job))
+            self.cond.notify()
+        return job
+
+    def cancel_book(self, book):
+        tok = self.tokens.pop(book, None)
+        if tok:
+            tok.set()
+            self.purge()
+
+    def purge(self):
+        """Drop cancelled jobs that have not started yet."""
+        with self.cond:
+            dropped = [job for _, _, job in self.heap if job.cancelled]
+            if not dropped:
+                return
+            self.heap = [e for e in self.heap if not e[2].cancelled]
+            heapq.heapify(self.heap)
+        for job in dropped:
+            job._done.set()
+            self._finished.emit(job)
+
+    def _take(self):
+        # called with self.cond held
+        busy = len(self.running)
+        for entry in sorted(self.heap):
+            job = entry[2]
+            if job.priority != PRIORITY_CURRENT and busy >= self.workers - 1:
+                continue
+            if all(self.in_use[r] + n <= self.limits.get(r, n) for r, n in job.resources.items()):
+                self.heap.remove(entry)
+                heapq.heapify(self.heap)
+                self.in_use.update(job.resources)
+                self.running.add(job)
+                job.started = time.monotonic()
+                self.waits.append((job.priority, (job.started - job.submitted) * 1000))
+                return job
+        return None
+
+    def _work(self):
+        while True:
+            with self.cond:
+                job = None
+                while not self.closing:
+                    job = self._take()
+                    if job:
+                        break
+                    self.cond.wait()
+                if job is None:
+                    return
+            kwargs = {}
+            if job.cancellable:
+                kwargs['cancel'] = job.token
+            if job.on_progress and not job.process:
+                kwargs['progress'] = lambda *a, j=job: self._progressed.emit(j, a)
+            try:
+                if job.cancelled:
+                    pass
+                elif job.process:
+                    job.result = self._process_pool().submit(job.fn, *job.args).result()
+                else:
+                    job.result = job.fn(*job.args, **kwargs)
+            except Exception as exc:
+                job.error = exc
+            with self.cond:
+                self.in_use.subtract(job.resources)
+                self.running.discard(job)
+                job.finished = time.monotonic()
+                self.runs.append((job.finished - job.started) * 1000)
+                self.cond.notify_all()
+            job._done.set()
+            self._finished.emit(job)
+
+    def _process_pool(self):
+        with self.cond:
+            if self.pool is None:
+                self.pool = concurrent.futures.ProcessPoolExecutor(
+                    mp_context=multiprocessing.get_context('spawn'))
+            return self.pool
+
+    def _report(self, job, args):
+        if job.on_progress and not job.cancelled:
+            job.on_progress(*args)
+
+    def _deliver(self, job):
+        if job.cancelled:
+            self.counts['cancelled'] += 1
+            if job.on_cancel:
+                job.on_cancel(job.result)
+        elif job.error is not None:
+            self.counts['failed'] += 1
+            if job.on_error:
+                job.on_error(job.error)
+        else:
+            self.counts['done'] += 1
+            if job.on_done:
+                job.on_done(job.result)
+
+    def metrics(self):
+        """Queue depth, resource use and wait/run latency percentiles in ms."""
+        with self.cond:
+            queued = collections.Counter(job.priority for _, _, job in self.heap)
+            out = {'running': len(self.running)}
+            for r, lim in self.limits.items():
+                out[f"{r} in use"] = f"{self.in_use[r]}/{lim}"
+            waits, runs = list(self.waits), sorted(self.runs)
+
+        def pct(vals, q):
+            return round(vals[min(len(vals) - 1, int(q * len(vals)))], 1) if vals else 0
+
+        for prio, name in PRIORITY_NAMES.items():
+            w = sorted(ms for p, ms in waits if p == prio)
+            out[f"queued {name}"] = queued[prio]
+            out[f"wait ms {name} p50/p95"] = f"{pct(w, 0.5)}/{pct(w, 0.95)}"
+        out['run ms p50/p95'] = f"{pct(runs, 0.5)}/{pct(runs, 0.95)}"
+        for k in ('done', 'failed', 'cancelled'):
+            out[f"jobs {k}"] = self.counts[k]
+        return out
+
+    def shutdown(self, timeout=2):
+        """Cancel everything and stop the workers, waiting ``timeout`` s at most.
+
+        Process jobs cannot see their cancel token, so the pool's children
+        are terminated rather than waited for. Workers still busy after
+        the deadline are daemon threads and are left behind.
+        """
+        with self.cond:
+            self.closing = True
+            for _, _, job in self.heap:
+                job.token.set()
+            for job in self.running:
+                job.token.set()
+            self.cond.notify_all()
+        self.purge()
+        if self.pool:
+            # the executor has no public way to stop a running call
+            for proc in list((getattr(self.pool, '_processes', None) or {}).values()):
+                proc.terminate()
+            self.pool.shutdown(wait=False, cancel_futures=True)
+        deadline = time.monotonic() + timeout
+        for t in self.threads:
+            t.join(max(0, deadline - time.monotonic()))
+
+# --- Listening sessions ---------------------------------------------------
+
+class SessionLog:
+    """Append-only binary log of play spans with aggregated queries.
+
+    Every record is a fixed 24 byte struct: book index, start and end
+    position in ms, playback rate and wall-clock start time. Book keys are
+    kept in a separate text file, one per line, the line number being the
+    index stored in the record.
+    """
+
+    REC = struct.Struct('<IIIfd')
+
+    def __init__(self, log_path=SESSION_LOG, books_path=SESSION_BOOKS):
+        self.log_path = Path(log_path)
+        self.books_path = Path(books_path)
+        self.books = []
+        self.book_idx = {}
+        if self.books_path.exists():
+            for line in self.books_path.read_text(encoding='utf-8').splitlines():
+                self.book_idx[line] = len(self.books)
+                self.books.append(line)
+        self._fh = None
+
+    def close(self):
+        if self._fh:
+            self._fh.close()
+            self._fh = None
+
+    def clear(self):
+        """Forget every recorded span and book."""
+        self.close()
+        for p in (self.log_path, self.books_path):
+            if p.exists():
+                p.write_bytes(b'')
+        self.books = []
+        self.book_idx = {}
+
+    def rename(self, old, new):
+        """File the spans recorded under book ``old`` under ``new``."""
+        idx = self.book_idx.pop(old, None)
+        if idx is None:
+            return
+        if new not in self.book_idx:
+            self.books[idx] = new
+            self.book_idx[new] = idx
+        else:
+            # both have spans: point old's records at new and blank its slot
+            self.close()
+            raw = bytearray(self.log_path.read_bytes())
+            target = self.book_idx[new]
+            for off in range(0, len(raw) - len(raw) % self.REC.size, self.REC.size):
+                if struct.unpack_from('<I', raw, off)[0] == idx:
+                    struct.pack_into('<I', raw, off, target)
+            tmp = self.log_path.with_suffix('.tmp')
+            tmp.write_bytes(raw)
+            os.replace(tmp, self.log_path)
+            self.books[idx] = ''
+        tmp = self.books_path.with_suffix('.tmp')
+        tmp.write_text(''.join(b + '\n' for b in self.books), encoding='utf-8')
+        os.replace(tmp, self.books_path)
+
+    def _index(self, book):
+        idx = self.book_idx.get(book)
+        if idx is None:
+            idx = len(self.books)
+            with open(self.books_path, 'a', encoding='utf-8') as f:
+                f.write(book + '\n')
+            self.book_idx[book] = idx
+            self.books.append(book)
+        return idx
+
+    def append(self, book, start_ms, end_ms, rate=1.0, wall=None):
+        """Record one span; spans that did not advance are ignored."""
+        if end_ms <= start_ms:
+            return
+        if wall is None:
+            wall = time.time()
+        rec = self.REC.pack(self._index(book), int(start_ms), int(end_ms),
+                            float(rate or 1.0), float(wall))
+        if self._fh is None:
+            self._fh = open(self.log_path, 'ab')
+        self._fh.write(rec)
+        self._fh.flush()
+
+    def records(self):
+        """Return all spans as a numpy structured array or a list of tuples."""
+        if self._fh:
+            self._fh.flush()
+        if not self.log_path.exists():
+            raw = b''
+        else:
+            raw = self.log_path.read_bytes()
+        raw = raw[:len(raw) - len(raw) % self.REC.size]
+        if np is not None:
+            dt = np.dtype([('book', '<u4'), ('start', '<u4'), ('end', '<u4'),
+                           ('rate', '<f4'), ('wall', '<f8')])
+            return np.frombuffer(raw, dtype=dt)
+        return list(self.REC.iter_unpack(raw))
+
+    def totals_by_book(self):
+        """Wall-clock listening time in ms for every book."""
+        recs = self.records()
+        if np is not None:
+            if not len(recs):
+                return {}
+            dur = (recs['end'].astype(np.float64) - recs['start']) / recs['rate']
+            tot = np.bincount(recs['book'], weights=dur)
+            return {self.books[i]: int(t) for i, t in enumerate(tot) if t > 0}
+        out = {}
+        for b, s, e, r, _ in recs:
+            out[self.books[b]] = out.get(self.books[b], 0) + (e - s) / r
+        return {k: int(v) for k, v in out.items()}
+
+    def totals_by_day(self, book=None):
+        """Wall-clock listening time in ms per local calendar day."""
+        recs = self.records()
+        idx = self.book_idx.get(book) if book is not None else None
+        if book is not None and idx is None:
+            return {}
+        if np is not None:
+            if idx is not None:
+                recs = recs[recs['book'] == idx]
+            if not len(recs):
+                return {}
+            dur = (recs['end'].astype(np.float64) - recs['start']) / recs['rate']
+            # UTC offset of each record: looked up once per UTC day, and per
+            # record only within days that contain a DST change
+            utc_days, inv = np.unique(np.floor(recs['wall'] / 86400), return_inverse=True)
+            first = np.array([time.localtime(d * 86400).tm_gmtoff for d in utc_days])
+            last = np.array([time.localtime(d * 86400 + 86399).tm_gmtoff for d in utc_days])
+            offset = first[inv].astype(np.float64)
+            mixed = (first != last)[inv]
+            if mixed.any():
+                offset[mixed] = [time.localtime(w).tm_gmtoff for w in recs['wall'][mixed]]
+            days = np.floor((recs['wall'] + offset) / 86400).astype(np.int64)
+            uniq, inv = np.unique(days, return_inverse=True)
+            tot = np.bincount(inv, weights=dur)
+            epoch = datetime.date(1970, 1, 1)
+            return {str(epoch + datetime.timedelta(days=int(d))): int(t)
+                    for d, t in zip(uniq, tot)}
+        out = {}
+        for b, s, e, r, w in recs:
+            if idx is not None and b != idx:
+                continue
+            day = str(datetime.date.fromtimestamp(w))
+            out[day] = out.get(day, 0) + (e - s) / r
+        return {k: int(v) for k, v in out.items()}
+
+    def _merged(self, book):
+        """Disjoint, sorted (start, end) spans of a book's listened content."""
+        idx = self.book_idx.get(book)
+        recs = self.records()
+        if np is not None:
+            if idx is None:
+                return np.zeros(0), np.zeros(0)
+            recs = recs[recs['book'] == idx]
+            if not len(recs):
+                return np.zeros(0), np.zeros(0)
+            order = np.argsort(recs['start'], kind='stable')
+            st = recs['start'][order].astype(np.float64)
+            en = np.maximum.accumulate(recs['end'][order].astype(np.float64))
+            new = np.ones(len(st), dtype=bool)
+            new[1:] = st[1:] > en[:-1]
+            starts = st[new]
+            ends = en[np.r_[np.nonzero(new)[0][1:] - 1, len(en) - 1]]
+            return starts, ends
+        spans = sorted((s, e) for b, s, e, _, _ in recs if b == idx)
+        merged = []
+        for s, e in spans:
+            if merged and s <= merged[-1][1]:
+                merged[-1][1] = max(merged[-1][1], e)
+            else:
+                merged.append([s, e])
+        return [m[0] for m in merged], [m[1] for m in merged]
+
+    def coverage(self, book, edges):
+        """Fraction of each [edges[i], edges[i+1]) range that was listened to."""
+        starts, ends = self._merged(book)
+        if len(edges) < 2:
+            return []
+        if np is not None:
+            edges = np.asarray(edges, dtype=np.float64)
+            if not len(starts):
+                return [0.0] * (len(edges) - 1)
+            lens = ends - starts
+            before = np.r_[0.0, np.cumsum(lens)[:-1]]
+            knots = np.column_stack((starts, ends)).ravel()
+            vals = np.column_stack((before, before + lens)).ravel()
+            cum = np.interp(edges, knots, vals)
+            width = np.diff(edges)
+            cov = np.divide(np.diff(cum), width, out=np.zeros_like(width), where=width > 0)
+            return [float(c) for c in np.clip(cov, 0.0, 1.0)]
+        out = []
+        for lo, hi in zip(edges, edges[1:]):
+            got = sum(max(0, min(e, hi) - max(s, lo)) for s, e in zip(starts, ends))
+            out.append(min(1.0, got / (hi - lo)) if hi > lo else 0.0)
+        return out
+
+    def percent_complete(self, book, length_ms):
+        if not length_ms:
+            return 0.0
+        return 100.0 * self.coverage(book, [0, length_ms])[0]
+
+# --- Book identity --------------------------------------------------------
+
+AUDIO_EXTS = ('.m4b', '.mp3', '.mp4', '.m4a', '.aac')
+
+def media_duration_ms(path):
+    try:
+        info = AFile(str(path)).info
+        return int(round(info.length * 1000))
+    except Exception:
+        return 0
+
+def fingerprint(path, duration_ms=None, block=64 * 1024, samples=8):
+    """Stable book id from a partial content hash.
+
+    Only the head and tail blocks and ``samples`` evenly spaced middle blocks
+    are read (through mmap), together with the file size and duration, so
+    the cost per file is constant no matter how long the book is.
+    """
+    path = Path(path)
+    size = path.stat().st_size
+    if duration_ms is None:
+        duration_ms = media_duration_ms(path)
+    h = hashlib.blake2b(digest_size=16)
+    h.update(struct.pack('<QQ', size, duration_ms))
+    if size:
+        with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if size <= block * (samples + 2):
+                h.update(mm)
+            else:
+                step = (size - block) // (samples + 1)
+                for off in [0] + [step * i for i in range(1, samples + 1)] + [size - block]:
+                    h.update(mm[off:off + block])
+    return h.hexdigest()
+
+
+class BookIndex:
+    """Map between content fingerprints and the paths books currently live at.
+
+    The table lives in ``resume_db['__books__']`` as ``{id: {path, size,
+    mtime}}``. A path whose size and mtime still match its entry is resolved
+    without hashing. Data saved under the old path keys is moved over to the
+    id the first time a book is identified, and to the new id when a known
+    file changes and hashes differently.
+    """
+
+    def __init__(self, db, sessions=None):
+        self.db = db
+        self.sessions = sessions
+        self.books = db.setdefault('__books__', {})
+        self.by_path = {e['path']: bid for bid, e in self.books.items()}
+
+    def path_of(self, book_id):
+        entry = self.books.get(book_id)
+        return entry['path'] if entry else None
+
+    def name_of(self, book_id):
+        return Path(self.path_of(book_id) or str(book_id)).name
+
+    def exists(self, book_id):
+        path = self.path_of(book_id)
+        return bool(path) and Path(path).exists()
+
+    def identify(self, path):
+        path = str(path)
+        st = os.stat(path)
+        old = self.by_path.get(path)
+        entry = self.books.get(old)
+        if entry and entry.get('size') == st.st_size and entry.get('mtime') == st.st_mtime:
+            return old
+        bid = fingerprint(path)
+        self._link(bid, path, st)
+        if old and old != bid:
+            self._rekey(old, bid)
+        self._migrate(path, bid)
+        return bid
+
+    def _link(self, bid, path, st=None):
+        st = st or os.stat(path)
+        old = self.books.get(bid)
+        if old and self.by_path.get(old['path']) == bid:
+            del self.by_path[old['path']]
+        self.books[bid] = {'path': path, 'size': st.st_size, 'mtime': st.st_mtime}
+        self.by_path[path] = bid
+
+    def _rekey(self, old, new):
+        """Move everything saved under ``old`` to ``new`` (a known file was re-tagged)."""
+        db = self.db
+        self.books.pop(old, None)
+        if old in db:
+            db.setdefault(new, db.pop(old))
+        for key in ('__lengths__', '__stamps__'):
+            table = db.get(key, {})
+            if old in table:
+                table.setdefault(new, table.pop(old))
+        for key in ('__bookshelf__', '__queue__'):
+            if key in db:
+                db[key] = list(dict.fromkeys(new if b == old else b for b in db[key]))
+        if db.get('__last_book__') == old:
+            db['__last_book__'] = new
+        for bm in db.get('__bookmarks__', []):
+            if bm.get('book') == old:
+                bm['book'] = new
+        for key, entry in list(db.get('__alignments__', {}).items()):
+            a, b = key.split('|')
+            if old in (a, b):
+                del db['__alignments__'][key]
+                store_alignment(db, new if a == old else a, new if b == old else b, entry['anchors'])
+        try:
+            os.replace(envelope_path(old), envelope_path(new))
+        except OSError:
+            pass
+        if self.sessions is not None:
+            self.sessions.rename(old, new)
+
+    def _migrate(self, path, bid):
+        db = self.db
+        if isinstance(db.get(path), int):
+            db.setdefault(bid, db.pop(path))
+        else:
+            db.pop(path, None)
+        lengths = db.get('__lengths__', {})
+        if path in lengths:
+            lengths.setdefault(bid, lengths.pop(path))
+        shelf = db.get('__bookshelf__', [])
+        db['__bookshelf__'] = list(dict.fromkeys(bid if p == path else p for p in shelf))
+        if db.get('__last_book__') == path:
+            db['__last_book__'] = bid
+        for bm in db.get('__bookmarks__', []):
+            if 'book' not in bm and bm.get('file') == path:
+                bm['book'] = bid
+
+    def migrate_legacy(self):
+        """Identify shelf and last-book entries still stored as paths."""
+        for key in list(self.db.get('__bookshelf__', [])) + [self.db.get('__last_book__')]:
+            if key and key not in self.books and Path(key).exists():
+                try:
+                    self.identify(key)
+                except OSError:
+                    pass
+
+    def missing(self):
+        return [bid for bid in self.books if not Path(self.books[bid]['path']).exists()]
+
+    def missing_by_size(self):
+        want = {}
+        for bid in self.missing():
+            want.setdefault(self.books[bid].get('size'), set()).add(bid)
+        return want
+
+    def link(self, matches):
+        for bid, path, st in matches:
+            self._link(bid, path, st)
+        return len(matches)
+
+
+def find_books(want, folders, progress=None, cancel=None):
+    """Find files under ``folders`` that are one of the books in ``want``.
+
+    ``want`` maps file size to a set of book ids. Candidates are filtered by
+    size first, so only files that could be one of them are hashed. Nothing
+    shared is touched, so this can run off the GUI thread; the result is a
+    list of ``(book_id, path, stat)`` for ``BookIndex.link``.
+    """
+    want = {size: set(ids) for size, ids in want.items()}
+    found = []
+    scanned = 0
+    for folder in folders:
+        for root, _, files in os.walk(folder):
+            for name in files:
+                if not want or (cancel and cancel.is_set()):
+                    return found
+                if not name.lower().endswith(AUDIO_EXTS):
+                    continue
+                path = os.path.join(root, name)
+                scanned += 1
+                if progress and scanned % 100 == 0:
+                    progress(scanned, len(found))
+                try:
+                    st = os.stat(path)
+                    if st.st_size not in want:
+                        continue
+                    bid = fingerprint(path)
+                except OSError:
+                    continue
+                if bid in want[st.st_size]:
+                    found.append((bid, path, st))
+                    want[st.st_size].discard(bid)
+                    if not want[st.st_size]:
+                        del want[st.st_size]
+    return found
+
+# --- Local read-ahead cache -----------------------------------------------
+
+def copy_chunked(src, dst, chunk=4 << 20, throttle_bps=0, progress=None, stop=None):
+    """Copy ``src`` to ``dst`` in chunks, continuing an existing partial ``dst``.
+
+    ``progress(done, total, bytes_per_s)`` is called after every chunk and
+    ``stop()`` is polled between chunks. ``throttle_bps`` caps the rate,
+    which lets a plain local folder stand in for a slow network share.
+    Returns True once ``dst`` holds the whole file.
+    """
+    total = os.path.getsize(src)
+    done = os.path.getsize(dst) if os.path.exists(dst) else 0
+    if done > total:
+        done = 0
+    start, t0 = done, time.monotonic()
+    with open(src, 'rb') as fi, open(dst, 'r+b' if done else 'wb') as fo:
+        fi.seek(done)
+        fo.seek(done)
+        fo.truncate()
+        while done < total:
+            if stop and stop():
+                return False
+            buf = fi.read(chunk)
+            if not buf:
+                break
+            fo.write(buf)
+            done += len(buf)
+            elapsed = time.monotonic() - t0
+            if throttle_bps:
+                ahead = (done - start) / throttle_bps - elapsed
+                if ahead > 0:
+                    time.sleep(ahead)
+                    elapsed += ahead
+            if progress:
+                progress(done, total, (done - start) / max(elapsed, 1e-6))
+    return done >= total
+
+
+class BookCache:
+    """Local copies of books under a byte budget with LRU eviction.
+
+    ``index.json`` maps book ids to their cache file, source size,
+    completion flag and last access time. Unfinished copies are kept as
+    ``.part`` files so they can be resumed later.
+    """
+
+    def __init__(self, root=CACHE_DIR, budget=4 << 30):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.budget = budget
+        self.index_path = self.root / 'index.json'
+        try:
+            self.index = json.loads(self.index_path.read_text())
+        except (OSError, ValueError):
+            self.index = {}
+
+    def _save(self):
+        self.index_path.write_text(json.dumps(self.index))
+
+    def _file(self, bid):
+        e = self.index[bid]
+        return self.root / (e['file'] if e['complete'] else e['file'] + '.part')
+
+    def local_path(self, bid):
+        """Path of a complete local copy, or None."""
+        e = self.index.get(bid)
+        if not e or not e['complete'] or not self._file(bid).exists():
+            return None
+        e['atime'] = time.time()
+        self._save()
+        return self._file(bid)
+
+    def begin(self, bid, src):
+        """Register (or validate) an entry for ``src`` and return its .part path."""
+        size = os.path.getsize(src)
+        e = self.index.get(bid)
+        if e and e['size'] != size:
+            self.remove(bid)
+            e = None
+        if e and e['complete'] and not (self.root / e['file']).exists():
+            # the local copy went missing; copy it again
+            e['complete'] = False
+            self._save()
+        if e is None:
+            e = self.index[bid] = {'file': bid + Path(src).suffix.lower(), 'size': size,
+                                   'complete': False, 'atime': time.time()}
+            self._save()
+        return self.root / (e['file'] + '.part')
+
+    def complete(self, bid):
+        e = self.index.get(bid)
+        if not e or e['complete']:
+            return
+        os.replace(self.root / (e['file'] + '.part'), self.root / e['file'])
+        e['complete'] = True
+        e['atime'] = time.time()
+        self._save()
+
+    def remove(self, bid):
+        """Drop ``bid`` from the cache; False if its file is still open elsewhere."""
+        if bid not in self.index:
+            return True
+        try:
+            self._file(bid).unlink()
+        except FileNotFoundError:
+            pass
+        except OSError:
+            # Windows refuses while VLC or ffmpeg has the file open
+            return False
+        del self.index[bid]
+        self._save()
+        return True
+
+    def _on_disk(self, bid):
+        try:
+            return self._file(bid).stat().st_size
+        except OSError:
+            return 0
+
+    def usage(self):
+        return sum(self._on_disk(bid) for bid in self.index)
+
+    def make_room(self, bid, keep=()):
+        """Evict least recently used entries until ``bid`` fits the budget."""
+        need = self.index[bid]['size'] - self._on_disk(bid)
+        if self.index[bid]['size'] > self.budget:
+            return False
+        used = self.usage()
+        victims = sorted((e['atime'], b) for b, e in self.index.items()
+                         if b != bid and b not in keep
+                         and not _copy_running(self.root / (e['file'] + '.part')))
+        while used + need > self.budget and victims:
+            _, victim = victims.pop(0)
+            size = self._on_disk(victim)
+            if self.remove(victim):
+                used -= size
+        return used + need <= self.budget
+
+
+_part_locks = {}
+_part_locks_guard = threading.Lock()
+
+def _copy_running(part):
+    lock = _part_locks.get(str(part))
+    return lock is not None and lock.locked()
+
+def cache_copy(src, part, throttle_bps=0, cancel=None, progress=None):
+    """Scheduler job: copy one book into its cache ``.part`` file.
+
+    Copies into the same ``.part`` file take turns: a cancelled copy may
+    still be writing its last chunk when the next one is queued, and the
+    GUI does not wait for it.
+    """
+    with _part_locks_guard:
+        lock = _part_locks.setdefault(str(part), threading.Lock())
+    with lock:
+        if cancel and cancel.is_set():
+            return False
+        return copy_chunked(src, part, throttle_bps=throttle_bps, progress=progress,
+                            stop=cancel.is_set if cancel else None)
+
+# --- Chapter export -------------------------------------------------------
+
+def probe_chapters(probe_cmd, path):
+    """Chapters of ``path`` as dicts with start/end in ms and a title."""
+    res = subprocess.run(
+        [probe_cmd, '-v', 'quiet', '-print_format', 'json', '-show_chapters', str(path)],
+        capture_output=True, check=True)
+    chapters = []
+    for c in json.loads(res.stdout).get('chapters', []):
+        chapters.append({'start': int(float(c['start_time']) * 1000),
+                         'end': int(float(c['end_time']) * 1000),
+                         'title': c.get('tags', {}).get('title', f"Chapter {len(chapters)+1}")})
+    return chapters
+
+def cover_art(path):
+    """Raw bytes of the first embedded cover image, or None."""
+    path = Path(path)
+    try:
+        audio = MP4(str(path)) if path.suffix.lower() in ('.m4b', '.mp4', '.m4a') else AFile(str(path))
+    except Exception:
+        return None
+    tags = getattr(audio, 'tags', None)
+    if tags is None:
+        return None
+    cov = tags.get('covr') if path.suffix.lower() in ('.m4b', '.mp4', '.m4a') else None
+    if cov:
+        return bytes(cov[0])
+    for key in tags.keys():
+        if key.startswith('APIC'):
+            return tags[key].data
+    pics = getattr(audio, 'pictures', None)
+    return pics[0].data if pics else None
+
+def _safe_name(text):
+    keep = ''.join(c if c.isalnum() or c in ' -_.,()' else '_' for c in text)
+    return keep.strip(' .')[:80] or 'Chapter'
+
+def export_chapters(path, out_dir, chapters, workers=None, progress=None, cancel=None, ffmpeg=None):
+    """Cut ``path`` into one file per chapter with ffmpeg stream copy.
+
+    Chapters are cut in parallel by up to ``workers`` ffmpeg processes. Each
+    output keeps the book's tags, gets the chapter title, a track number
+    and the cover art. ``progress(done, total, bytes_written, elapsed)`` is
+    called as chapters finish; setting the ``cancel`` event kills running
+    cuts. Returns ``(written, errors)``.
+    """
+    ff = ffmpeg or shutil.which('ffmpeg')
+    if not ff:
+        raise FileNotFoundError('ffmpeg not found')
+    path, out_dir = Path(path), Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    ext = '.mp3' if path.suffix.lower() == '.mp3' else '.m4a'
+    try:
+        easy = AFile(str(path), easy=True) or {}
+        album = (easy.get('album') or easy.get('title') or [path.stem])[0]
+    except Exception:
+        album = path.stem
+    cancel = cancel or threading.Event()
+    running = set()
+    lock = threading.Lock()
+    total = len(chapters)
+    with tempfile.TemporaryDirectory() as tmp:
+        cover = cover_art(path)
+        cover_file = None
+        if cover:
+            cover_file = Path(tmp) / ('cover.png' if cover[:4] == b'\x89PNG' else 'cover.jpg')
+            cover_file.write_bytes(cover)
+
+        def cut(i, ch):
+            if cancel.is_set():
+                return None
+            dst = out_dir / f"{i:03d} - {_safe_name(ch['title'])}{ext}"
+            cmd = [ff, '-y', '-loglevel', 'error', '-ss', str(ch['start'] / 1000.0),
+                   '-i', str(path)]
+            if cover_file:
+                cmd += ['-i', str(cover_file)]
+            cmd += ['-t', str((ch['end'] - ch['start']) / 1000.0), '-map', '0:a']
+            if cover_file:
+                cmd += ['-map', '1:v', '-disposition:v', 'attached_pic']
+            cmd += ['-c', 'copy', '-map_metadata', '0', '-map_chapters', '-1',
+                    '-metadata', f"title={ch['title']}", '-metadata', f"album={album}",
+                    '-metadata', f"track={i}/{total}", str(dst)]
+            proc = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+            with lock:
+                running.add(proc)
+                if cancel.is_set():
+                    proc.kill()
+            try:
+                _, err = proc.communicate()
+            finally:
+                with lock:
+                    running.discard(proc)
+            if proc.returncode != 0:
+                if cancel.is_set():
+                    dst.unlink(missing_ok=True)
+                    return None
+                raise RuntimeError(f"{dst.name}: {err.decode(errors='ignore').strip()}")
+            return dst
+
+        written, errors = [], []
+        size = 0
+        t0 = time.monotonic()
+        workers = workers or os.cpu_count() or 2
+        pool = concurrent.futures.ThreadPoolExecutor(max_workers=workers)
+
+        def stop():
+            cancel.set()
+            with lock:
+                for proc in running:
+                    proc.kill()
+            pool.shutdown(wait=False, cancel_futures=True)
+
+        try:
+            pending = {pool.submit(cut, i, ch) for i, ch in enumerate(chapters, 1)}
+            while pending:
+                done, pending = concurrent.futures.wait(
+                    pending, timeout=0.2, return_when=concurrent.futures.FIRST_COMPLETED)
+                for fut in done:
+                    if fut.cancelled():
+                        continue
+                    try:
+                        dst = fut.result()
+                    except (RuntimeError, OSError) as exc:
+                        errors.append(str(exc))
+                        continue
+                    if dst:
+                        written.append(dst)
+                        size += dst.stat().st_size
+                if done and progress:
+                    progress(len(written) + len(errors), total, size, time.monotonic() - t0)
+                if cancel.is_set():
+                    stop()
+                    # cancelled futures never report done to wait()
+                    pending = {fut for fut in pending if not fut.cancelled()}
+        except BaseException:
+            # Ctrl-C from the CLI: don't let the pool drain the queue first.
+            stop()
+            pool.shutdown()
+            raise
+        pool.shutdown()
+    return sorted(written), errors
+
+
+# --- Data export / import -------------------------------------------------
+
+EXPORT_FORMAT = 'm4bplayer-export'
+SETTING_KEYS = ('ui_btn_size', 'ui_title_size', 'volume',
+                'cache_enabled', 'cache_budget_mb', 'cache_prefetch')
+
+def set_position(db, book_id, ms, ts=None):
+    """Store a resume position and stamp it for last-writer-wins merges."""
+    if db.get(book_id) == ms:
+        return
+    db[book_id] = ms
+    db.setdefault('__stamps__', {})[book_id] = ts if ts is not None else time.time()
+
+def _export_records(db, sessions, since):
+    stamps = db.get('__stamps__', {})
+    lengths = db.get('__lengths__', {})
+    for bid, entry in db.get('__books__', {}).items():
+        ts = stamps.get(bid, 0)
+        if ts > since or not since:
+            yield {'type': 'book', 'id': bid, 'path': entry['path'], 'size': entry.get('size'),
+                   'pos': db.get(bid, 0), 'ts': ts, 'length': lengths.get(bid)}
+    for bm in db.get('__bookmarks__', []):
+        if bm.get('ts', 0) > since or not since:
+            yield dict(bm, type='bookmark')
+    for key, entry in db.get('__alignments__', {}).items():
+        if entry.get('ts', 0) > since or not since:
+            yield {'type': 'alignment', 'key': key, 'anchors': entry['anchors'], 'ts': entry.get('ts', 0)}
+    yield {'type': 'shelf', 'books': db.get('__bookshelf__', []), 'last': db.get('__last_book__')}
+    for key in SETTING_KEYS:
+        if key in db:
+            yield {'type': 'setting', 'key': key, 'value': db[key]}
+    if sessions is not None:
+        recs = sessions.records()
+        chunk = []
+        for rec in recs:
+            b, s, e, r, w = (rec.tolist() if hasattr(rec, 'tolist') else rec)
+            if w <= since:
+                continue
+            chunk.append([sessions.books[b], s, e, r, w])
+            if len(chunk) == 1000:
+                yield {'type': 'sessions', 'spans': chunk}
+                chunk = []
+        if chunk:
+            yield {'type': 'sessions', 'spans': chunk}
+
+def export_data(db, dest, sessions=None, since=0):
+    """Write player data to a gzip-compressed JSON-lines archive.
+
+    The first line is a header carrying the export time. With ``since``
+    (the creation time of an earlier export) only positions, bookmarks,
+    edition alignments and sessions changed after it are written. Returns the record count.
+    """
+    count = 0
+    with gzip.open(dest, 'wt', encoding='utf-8') as f:
+        header = {'type': 'header', 'format': EXPORT_FORMAT, 'version': 1,
+                  'created': time.time(), 'since': since}
+        f.write(json.dumps(header) + '\n')
+        for rec in _export_records(db, sessions, since):
+            f.write(json.dumps(rec, separators=(',', ':')) + '\n')
+            count += 1
+    return count
+
+def read_export_header(path):
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        header = json.loads(f.readline())
+    if header.get('format') != EXPORT_FORMAT:
+        raise ValueError(f"{path} is not a player data export")
+    return header
+
+def import_data(db, src, sessions=None):
+    """Merge an export archive into ``db`` one record at a time.
+
+    Books are matched by id. Positions and edition alignments follow
+    last-writer-wins on their timestamps, bookmarks are unioned and
+    settings are only filled in when missing locally. Returns counts of
+    what changed.
+    """
+    stats = collections.Counter()
+    books = db.setdefault('__books__', {})
+    stamps = db.setdefault('__stamps__', {})
+    marks = db.setdefault('__bookmarks__', [])
+    have = {(bm.get('book') or bm.get('file'), bm.get('pos'), bm.get('note', '')) for bm in marks}
+    seen_spans = None
+    with gzip.open(src, 'rt', encoding='utf-8') as f:
+        header = json.loads(f.readline())
+        if header.get('format') != EXPORT_FORMAT:
+            raise ValueError(f"{src} is not a player data export")
+        for line in f:
+            rec = json.loads(line)
+            kind = rec.pop('type', None)
+            if kind == 'book':
+                bid = rec['id']
+                local = books.get(bid)
+                if local is None or (local['path'] != rec['path'] and not Path(local['path']).exists()):
+                    books[bid] = {'path': rec['path'], 'size': rec.get('size'), 'mtime': None}
+                    stats['books'] += 1
+                if rec.get('length'):
+                    db.setdefault('__lengths__', {}).setdefault(bid, rec['length'])
+                if rec.get('ts', 0) > stamps.get(bid, 0):
+                    db[bid] = rec['pos']
+                    stamps[bid] = rec['ts']
+                    stats['positions'] += 1
+            elif kind == 'bookmark':
+                key = (rec.get('book') or rec.get('file'), rec.get('pos'), rec.get('note', ''))
+                if key not in have:
+                    have.add(key)
+                    marks.append(rec)
+                    stats['bookmarks'] += 1
+            elif kind == 'alignment':
+                aligns = db.setdefault('__alignments__', {})
+                if rec.get('ts', 0) > aligns.get(rec['key'], {}).get('ts', 0):
+                    aligns[rec['key']] = {'anchors': rec['anchors'], 'ts': rec.get('ts', 0)}
+                    stats['alignments'] += 1
+            elif kind == 'shelf':
+                shelf = db.setdefault('__bookshelf__', [])
+                shelf.extend(b for b in rec.get('books', []) if b not in shelf)
+                if rec.get('last') and '__last_book__' not in db:
+                    db['__last_book__'] = rec['last']
+            elif kind == 'setting':
+                db.setdefault(rec['key'], rec['value'])
+            elif kind == 'sessions' and sessions is not None:
+                if seen_spans is None:
+                    seen_spans = {(sessions.books[r[0]], r[1], r[2], r[4])
+                                  for r in (x.tolist() if hasattr(x, 'tolist') else x
+                                            for x in sessions.records())}
+                for book, s, e, r, w in rec['spans']:
+                    if (book, s, e, w) not in seen_spans:
+                        seen_spans.add((book, s, e, w))
+                        sessions.append(book, s, e, r, w)
+                        stats['sessions'] += 1
+    return stats
+
+
+class DataViewDialog(QtWidgets.QDialog):
+    """Browse the player data a page at a time."""
+
+    PAGE = 200
+    RAW_PAGE = 64 * 1024
+    EXPAND = ('__books__', '__bookmarks__', '__bookshelf__', '__lengths__', '__stamps__')
+
+    def __init__(self, parent):
+        super().__init__(parent)
+        self.parent = parent
+        self.page = 0
+        self.setWindowTitle("All Data")
+        layout = QtWidgets.QVBoxLayout(self)
+        self.decrypt = QtWidgets.QCheckBox("Decrypt and show all data")
+        self.decrypt.setChecked(True)
+        self.decrypt.toggled.connect(lambda _: self.show_page(0))
+        layout.addWidget(self.decrypt)
+        self.table = QtWidgets.QTableWidget(0, 2)
+        self.table.setHorizontalHeaderLabels(["Key", "Value"])
+        self.table.horizontalHeader().setStretchLastSection(True)
+        self.table.itemDoubleClicked.connect(self._show_full)
+        layout.addWidget(self.table)
+        self.raw = QtWidgets.QPlainTextEdit()
+        self.raw.setReadOnly(True)
+        layout.addWidget(self.raw)
+        nav = QtWidgets.QHBoxLayout()
+        self.prev_btn = QtWidgets.QPushButton("◀ Prev")
+        self.next_btn = QtWidgets.QPushButton("Next ▶")
+        self.page_lbl = QtWidgets.QLabel()
+        self.prev_btn.clicked.connect(lambda: self.show_page(self.page - 1))
+        self.next_btn.clicked.connect(lambda: self.show_page(self.page + 1))
+        nav.addWidget(self.prev_btn)
+        nav.addWidget(self.page_lbl, 1)
+        nav.addWidget(self.next_btn)
+        layout.addLayout(nav)
+        self.show_page(0)
+
+    def _show_full(self, item):
+        key = self.table.item(item.row(), 0).text()
+        val = json.dumps(json.loads(self.table.item(item.row(), 1).text()), indent=2)
+        self.parent._show_meta_full(QtWidgets.QTreeWidgetItem([key, val]), None)
+
+    def _rows(self):
+        db = self.parent.resume_db
+        for key in sorted(db):
+            val = db[key]
+            if key in self.EXPAND and isinstance(val, dict):
+                for sub in val:
+                    yield f"{key}[{sub}]", val[sub]
+            elif key in self.EXPAND and isinstance(val, list):
+                for i, sub in enumerate(val):
+                    yield f"{key}[{i}]", sub
+            else:
+                yield key, val
+
+    def show_page(self, page):
+        page = max(0, page)
+        if self.decrypt.isChecked():
+            self.table.show()
+            self.raw.hide()
+            rows = list(itertools.islice(self._rows(), page * self.PAGE, (page + 1) * self.PAGE + 1))
+            if not rows and page:
+                return
+            more = len(rows) > self.PAGE
+            self.table.setRowCount(0)
+            for key, val in rows[:self.PAGE]:
+                row = self.table.rowCount()
+                self.table.insertRow(row)
+                self.table.setItem(row, 0, QtWidgets.QTableWidgetItem(key))
+                self.table.setItem(row, 1, QtWidgets.QTableWidgetItem(json.dumps(val)))
+        else:
+            self.table.hide()
+            self.raw.show()
+            size = RESUME_DB.stat().st_size if RESUME_DB.exists() else 0
+            if page * self.RAW_PAGE >= size and page:
+                return
+            chunk = b''
+            if size:
+                with open(RESUME_DB, 'rb') as f:
+                    f.seek(page * self.RAW_PAGE)
+                    chunk = f.read(self.RAW_PAGE)
+            self.raw.setPlainText(chunk.decode(errors='ignore'))
+            more = (page + 1) * self.RAW_PAGE < size
+        self.page = page
+        self.page_lbl.setText(f"Page {page + 1}")
+        self.prev_btn.setEnabled(page > 0)
+        self.next_btn.setEnabled(more)
+
+# --- Up next queue --------------------------------------------------------
+
+def read_metadata(path):
+    """Tags and decoded cover images of ``path``; safe to call off the GUI thread."""
+    path = Path(path)
+    audio = MP4(str(path)) if path.suffix.lower() in ('.m4b', '.mp4', '.m4a') else AFile(str(path))
+    tags = dict(audio.tags or {})
+    images = []
+    cov = tags.get('covr')
+    if cov:
+        for data in (cov if isinstance(cov, list) else [cov]):
+            qimg = QtGui.QImage.fromData(bytes(data))
+            if not qimg.isNull():
+                images.append(qimg)
+    return tags, images
+
+def natural_key(name):
+    return [int(part) if part.isdigit() else part.lower() for part in re.split(r'(\d+)', name)]
+
+def series_next(path):
+    """The book after ``path`` in its folder, in natural file name order."""
+    path = Path(path)
+    try:
+        names = sorted((p.name for p in path.parent.iterdir()
+                        if p.suffix.lower() in AUDIO_EXTS and p.is_file()), key=natural_key)
+    except OSError:
+        return None
+    if path.name not in names:
+        return None
+    idx = names.index(path.name)
+    return str(path.parent / names[idx + 1]) if idx + 1 < len(names) else None
+
+
+class PreparedBook:
+    """A parsed VLC media plus chapters, tags and cover ready to be shown."""
+
+    def __init__(self, path, media_path, media):
+        self.path = path
+        self.media_path = media_path
+        self.media = media
+        self.claimed = False
+        self.duration = 0
+        self.chapters = []
+        self.tags = {}
+        self.images = []
+
+    def release(self):
+        if self.media is not None:
+            RESOURCES.release_media(self.media)
+            self.media = None
+
+
+def prepare_book(vlc_inst, path, media_path, probe_cmd, cancel=None):
+    """Scheduler job: parse the next book's media and read its chapters and metadata."""
+    cancel = cancel or CancelToken()
+    book = PreparedBook(path, media_path, RESOURCES.new_media(vlc_inst, media_path))
+    book.media.parse_with_options(vlc.MediaParseFlag.local, 5000)
+    for _ in range(250):
+        if cancel.is_set() or book.media.get_parsed_status():
+            break
+        time.sleep(0.02)
+    book.duration = book.media.get_duration()
+    try:
+        if probe_cmd and not cancel.is_set():
+            book.chapters = probe_chapters(probe_cmd, book.path)
+    except (OSError, subprocess.CalledProcessError, ValueError):
+        pass
+    try:
+        if not cancel.is_set():
+            book.tags, book.images = read_metadata(book.path)
+    except Exception:
+        pass
+    if cancel.is_set():
+        book.release()
+        return None
+    return book
+
+# --- Edition alignment ----------------------------------------------------
+
+ENVELOPE_RATE = 10   # loudness frames per second
+ENVELOPE_SR = 4000   # decode rate; loudness needs no more
+
+def _decode_envelope(ff, path, start_s, length_s, cancel=None, sr=ENVELOPE_SR, rate=ENVELOPE_RATE):
+    """dB loudness of one stretch of ``path``, streamed from ffmpeg as mono s16."""
+    hop = sr // rate
+    cmd = [ff, '-v', 'error', '-ss', f'{start_s:.3f}']
+    if length_s:
+        cmd += ['-t', f'{length_s:.3f}']
+    cmd += ['-i', str(path), '-vn', '-ac', '1', '-ar', str(sr), '-f', 's16le', '-']
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    frame = hop * 2
+    parts, rest = [], b''
+    try:
+        while True:
+            if cancel and cancel.is_set():
+                proc.kill()
+                break
+            buf = proc.stdout.read(frame * 2048)
+            if not buf:
+                break
+            buf = rest + buf
+            n = len(buf) // frame * frame
+            rest = buf[n:]
+            x = np.frombuffer(buf[:n], dtype='<i2').astype(np.float32).reshape(-1, hop)
+            parts.append(np.einsum('ij,ij->i', x, x) / hop)
+    finally:
+        proc.stdout.close()
+        proc.wait()
+    power = np.concatenate(parts) if parts else np.zeros(0, np.float32)
+    env = (10 * np.log10(power + 1.0)).astype(np.float32)
+    if length_s:
+        want = int(round(length_s * rate))
+        env = np.pad(env[:want], (0, max(0, want - len(env))), mode='edge' if len(env) else 'constant')
+    return env
+
+def loudness_envelope(path, workers=None, ffmpeg=None, cancel=None, duration_ms=None):
+    """Coarse loudness of ``path`` at ``ENVELOPE_RATE`` frames per second.
+
+    The book is cut into stretches decoded by parallel ffmpeg processes and
+    reduced to one dB value per frame with NumPy as the PCM streams in, so
+    nothing near the size of the decoded audio is ever held in memory.
+    """
+    if np is None:
+        raise RuntimeError("numpy is required for edition alignment")
+    ff = ffmpeg or shutil.which('ffmpeg')
+    if not ff:
+        raise FileNotFoundError('ffmpeg not found')
+    secs = (duration_ms if duration_ms is not None else media_duration_ms(path)) / 1000
+    workers = workers or os.cpu_count() or 2
+    if secs <= 0:
+        return _decode_envelope(ff, path, 0, 0, cancel)
+    # whole seconds per stretch keep the frames of neighbouring stretches contiguous
+    count = max(1, min(workers * 2, int(secs // 600)))
+    step = math.ceil(secs / count)
+    starts = [i * step for i in range(count) if i * step < secs]
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as pool:
+        parts = list(pool.map(lambda s: _decode_envelope(ff, path, s, min(step, secs - s), cancel), starts))
+    return np.concatenate(parts)
+
+def envelope_path(book_id):
+    return ENVELOPE_DIR / f"{book_id}.npy"
+
+def cached_envelope(book_id):
+    """A previously computed envelope for ``book_id``, or None."""
+    if np is None or not book_id:
+        return None
+    try:
+        return np.load(envelope_path(book_id))
+    except (OSError, ValueError):
+        return None
+
+def book_envelope(path, book_id=None, workers=None, cancel=None):
+    """Envelope of ``path``, computed once per book and kept under ``ENVELOPE_DIR``."""
+    env = cached_envelope(book_id)
+    if env is None:
+        env = loudness_envelope(path, workers, cancel=cancel)
+        if book_id and not (cancel and cancel.is_set()):
+            ENVELOPE_DIR.mkdir(parents=True, exist_ok=True)
+            tmp = envelope_path(book_id).with_suffix('.tmp.npy')
+            np.save(tmp, env)
+            os.replace(tmp, envelope_path(book_id))
+    return env
+
+def _best_match(win, seg):
+    """Offset of ``win`` in ``seg`` by FFT normalised cross-correlation, with its score."""
+    m = len(win)
+    if len(seg) < m:
+        return 0, 0.0
+    w = win.astype(np.float64) - win.mean()
+    wn = math.sqrt(float(w @ w))
+    if wn == 0:
+        return 0, 0.0
+    seg = seg.astype(np.float64)
+    nfft = 1 << (len(seg) + m - 1).bit_length()
+    corr = np.fft.irfft(np.fft.rfft(seg, nfft) * np.conj(np.fft.rfft(w, nfft)), nfft)[:len(seg) - m + 1]
+    # w has zero mean, so only the spread of each stretch of seg is still needed
+    c1 = np.concatenate(([0.0], np.cumsum(seg)))
+    c2 = np.concatenate(([0.0], np.cumsum(seg * seg)))
+    s1 = c1[m:] - c1[:-m]
+    var = np.maximum(c2[m:] - c2[:-m] - s1 * s1 / m, 1e-9)
+    score = corr / (np.sqrt(var) * wn)
+    i = int(np.argmax(score))
+    return i, float(score[i])
+
+def align_envelopes(a, b, rate=ENVELOPE_RATE, window_s=60, step_s=30, search_s=600, min_score=0.6):
+    """Piecewise mapping from positions in edition ``a`` to edition ``b``.
+
+    Each ``window_s`` stretch of ``a`` (every ``step_s``) is located in ``b``
+    near where the previous match predicts, falling back to the whole of
+    ``b`` when that fails. Quiet or flat stretches are skipped, and matches
+    that disagree with their neighbours or run backwards are dropped.
+    Returns ``[[a_ms, b_ms], ...]`` anchors at window centres.
+    """
+    W, S, R = window_s * rate, step_s * rate, search_s * rate
+    found = []
+    offset = None
+    for start in range(0, len(a) - W + 1, S):
+        win = a[start:start + W]
+        if win.std() < 1.0:
+            continue
+        score = 0.0
+        if offset is not None:
+            lo = max(0, start + offset - R)
+            i, score = _best_match(win, b[lo:start + offset + W + R])
+            i += lo
+        if score < min_score:
+            i, score = _best_match(win, b)
+        if score < min_score:
+            continue
+        offset = i - start
+        found.append((start, offset))
+    offsets = [o for _, o in found]
+    anchors = []
+    for k, (start, off) in enumerate(found):
+        near = sorted(offsets[max(0, k - 2):k + 3])
+        if abs(off - near[len(near) // 2]) > 2 * rate:
+            continue
+        pos_a = (start + W / 2) * 1000 / rate
+        pos_b = pos_a + off * 1000 / rate
+        if anchors and pos_b <= anchors[-1][1]:
+            continue
+        anchors.append([int(pos_a), int(pos_b)])
+    return anchors
+
+def edition_envelopes(path_a, path_b, id_a=None, id_b=None, workers=None, cancel=None):
+    """Scheduler job: the envelopes of two editions, for ``align_envelopes``."""
+    env_a = book_envelope(path_a, id_a, workers, cancel)
+    env_b = book_envelope(path_b, id_b, workers, cancel)
+    if cancel and cancel.is_set():
+        return None
+    return env_a, env_b
+
+def store_alignment(db, id_a, id_b, anchors):
+    if id_a > id_b:
+        id_a, id_b = id_b, id_a
+        anchors = [[b, a] for a, b in anchors]
+    db.setdefault('__alignments__', {})[f"{id_a}|{id_b}"] = {'anchors': anchors, 'ts': time.time()}
+
+def aligned_editions(db, book_id):
+    out = []
+    for key in db.get('__alignments__', {}):
+        a, b = key.split('|')
+        if book_id in (a, b):
+            out.append(b if a == book_id else a)
+    return out
+
+def translate_position(db, src, dst, ms):
+    """``ms`` in edition ``src`` as a position in ``dst``, or None if they are not aligned."""
+    if src == dst:
+        return ms
+    entry = db.get('__alignments__', {}).get(f"{min(src, dst)}|{max(src, dst)}")
+    if not entry or not entry['anchors']:
+        return None
+    pairs = entry['anchors'] if src < dst else [[b, a] for a, b in entry['anchors']]
+    xs = [p[0] for p in pairs]
+    i = bisect.bisect_right(xs, ms)
+    if i == 0 or i == len(pairs):
+        # before the first or after the last anchor keep that anchor's offset
+        x, y = pairs[0] if i == 0 else pairs[-1]
+        return max(0, int(ms + y - x))
+    (x0, y0), (x1, y1) = pairs[i - 1], pairs[i]
+    return int(y0 + (ms - x0) * (y1 - y0) / (x1 - x0))
+
+# --- Scrubbing ------------------------------------------------------------
+
+SCRUB_SEEK_MS = 150  # at most one native seek this often while dragging
+
+class SeekThrottle:
+    """Coalesce a stream of seek targets into at most one seek per ``interval_ms``.
+
+    ``move`` seeks straight away when the previous seek is old enough and
+    otherwise just remembers the target; ``flush`` commits whatever is
+    still pending. ``seeks`` counts the seeks that reached the player.
+    """
+
+    def __init__(self, seek, interval_ms=SCRUB_SEEK_MS):
+        self.seek = seek
+        self.interval = interval_ms / 1000
+        self.last = -math.inf
+        self.pending = None
+        self.seeks = 0
+
+    def move(self, ms):
+        self.pending = ms
+        if time.monotonic() - self.last >= self.interval:
+            self.flush()
+
+    def flush(self):
+        if self.pending is None:
+            return
+        ms, self.pending = self.pending, None
+        self.last = time.monotonic()
+        self.seeks += 1
+        self.seek(ms)
+
+def level_sketch(env, ms, span_s=10, bars=20, floor_db=30.0, top_db=90.0):
+    """Block characters sketching the loudness envelope around ``ms``."""
+    centre = int(ms / 1000 * ENVELOPE_RATE)
+    half = span_s * ENVELOPE_RATE // 2
+    seg = env[max(0, centre - half):centre + half]
+    if not len(seg):
+        return ''
+    blocks = '▁▂▃▄▅▆▇█'
+    peaks = [float(part.max()) if len(part) else floor_db for part in np.array_split(seg, bars)]
+    return ''.join(blocks[min(7, max(0, int((p - floor_db) / (top_db - floor_db) * 8)))] for p in peaks)
+
+
 class BookmarkDialog(QtWidgets.QDialog):
     def __init__(self, parent):
         super().__init__(parent)
@@ -124,7 +1712,7 @@ class BookmarkDialog(QtWidgets.QDialog):
 
         self.add_btn.clicked.connect(self.add_bookmark)
         self.load_btn.clicked.connect(self.load_selected_from_button)
-        self.last_btn.clicked.connect(lambda: parent.player.set_time(parent.prev_time))
+        self.last_btn.clicked.connect(lambda: parent.seek(parent.prev_time))
         self.del_btn.clicked.connect(self.delete_selected)
         self.table.itemDoubleClicked.connect(self.load_selected)
 
@@ -139,7 +1727,8 @@ class BookmarkDialog(QtWidgets.QDialog):
         for bm in self.parent.resume_db.get('__bookmarks__', []):
             row = self.table.rowCount()
             self.table.insertRow(row)
-            self.table.setItem(row, 0, QtWidgets.QTableWidgetItem(Path(bm['file']).name[:30]))
+            path = self.parent.books.path_of(bm.get('book')) or bm['file']
+            self.table.setItem(row, 0, QtWidgets.QTableWidgetItem(Path(path).name[:30]))
             self.table.setItem(row, 1, QtWidgets.QTableWidgetItem(self.fmt(bm['pos'])))
             self.table.setItem(row, 2, QtWidgets.QTableWidgetItem(bm.get('note', '')))
 
@@ -147,7 +1736,8 @@ class BookmarkDialog(QtWidgets.QDialog):
         if not self.parent.current_file:
             return
         note, _ = QtWidgets.QInputDialog.getText(self, "Note", "Bookmark note:")
-        bm = {'file': self.parent.current_file, 'pos': self.parent.player.get_time(), 'note': note}
+        bm = {'book': self.parent.current_book, 'file': self.parent.current_file,
+              'pos': self.parent.player.get_time(), 'note': note, 'ts': time.time()}
         self.parent.resume_db.setdefault('__bookmarks__', []).append(bm)
         save_resume(self.parent.resume_db)
         self.refresh()
@@ -165,11 +1755,22 @@ class BookmarkDialog(QtWidgets.QDialog):
         if row >= len(bms):
             return
         bm = bms[row]
-        if Path(bm['file']).exists():
+        db, books = self.parent.resume_db, self.parent.books
+        book, pos = bm.get('book'), bm['pos']
+        cur = self.parent.current_book
+        if book and cur and book != cur and cur in aligned_editions(db, book):
+            # a bookmark made in another edition of the book playing now
+            book, pos = cur, translate_position(db, book, cur, pos)
+        path = books.path_of(book) or bm['file']
+        if not Path(path).exists() and book:
+            for other in aligned_editions(db, book):
+                if books.exists(other):
+                    path, pos = books.path_of(other), translate_position(db, book, other, pos)
+                    break
+        if Path(path).exists():
             self.parent.prev_time = self.parent.player.get_time()
-            self.parent.load_media(Path(bm['file']))
-            self.parent.player.set_time(bm['pos'])
-            self.parent.resume_db['__last_book__'] = bm['file']
+            self.parent.load_media(Path(path))
+            self.parent.seek(pos)
             save_resume(self.parent.resume_db)
 
     def delete_selected(self):
@@ -181,6 +1782,56 @@ class BookmarkDialog(QtWidgets.QDialog):
         save_resume(self.parent.resume_db)
         self.refresh()
 
+
+class StatsDialog(QtWidgets.QDialog):
+    """Listening statistics aggregated from the session log."""
+    def __init__(self, parent):
+        super().__init__(parent)
+        self.parent = parent
+        self.setWindowTitle("Listening Stats")
+        self.setStyleSheet(parent.styleSheet())
+        layout = QtWidgets.QVBoxLayout(self)
+        tabs = QtWidgets.QTabWidget()
+        layout.addWidget(tabs)
+        self.book_table = QtWidgets.QTableWidget(0, 3)
+        self.book_table.setHorizontalHeaderLabels(["Book", "Listened", "Complete"])
+        tabs.addTab(self.book_table, "Per Book")
+        self.day_table = QtWidgets.QTableWidget(0, 2)
+        self.day_table.setHorizontalHeaderLabels(["Day", "Listened"])
+        tabs.addTab(self.day_table, "Per Day")
+        self.ch_table = QtWidgets.QTableWidget(0, 2)
+        self.ch_table.setHorizontalHeaderLabels(["Chapter", "Coverage"])
+        tabs.addTab(self.ch_table, "Chapter Coverage")
+        self.refresh()
+
+    def _add_row(self, table, values):
+        row = table.rowCount()
+        table.insertRow(row)
+        for col, val in enumerate(values):
+            table.setItem(row, col, QtWidgets.QTableWidgetItem(val))
+        return row
+
+    def refresh(self):
+        log = self.parent.sessions
+        lengths = self.parent.resume_db.get('__lengths__', {})
+        self.book_table.setRowCount(0)
+        for book, ms in sorted(log.totals_by_book().items(), key=lambda kv: -kv[1]):
+            pct = log.percent_complete(book, lengths.get(book, 0))
+            self._add_row(self.book_table, [self.parent.books.name_of(book)[:40], fmt_ms(ms), f"{pct:.1f}%"])
+        self.day_table.setRowCount(0)
+        for day, ms in sorted(log.totals_by_day().items(), reverse=True):
+            self._add_row(self.day_table, [day, fmt_ms(ms)])
+        self.ch_table.setRowCount(0)
+        book = self.parent.current_book
+        length = lengths.get(book, 0) if book else 0
+        if not book or not self.parent.chapters or not length:
+            return
+        edges = [ms for ms, _ in self.parent.chapters] + [length]
+        for (_, title), cov in zip(self.parent.chapters, log.coverage(book, edges)):
+            row = self._add_row(self.ch_table, [title, f"{cov*100:.0f}%"])
+            heat = QtGui.QColor.fromHsv(int(120 * cov), 160, 60 + int(120 * cov))
+            self.ch_table.item(row, 1).setBackground(heat)
+
 # --- Extra UI Elements ----------------------------------------------------
 
 class ClickableLabel(QtWidgets.QLabel):
@@ -224,46 +1875,152 @@ class GalleryDialog(QtWidgets.QDialog):
         super().resizeEvent(e)
 
 
-class VisualizerThread(QtCore.QThread):
-    """Decode audio on the fly and emit level data."""
+class LevelRing:
+    """Shared-memory ring of analysis frames written by the visualizer process.
 
-    level = QtCore.pyqtSignal(float)
+    The block starts with an int64 frame counter followed by ``slots`` rows of
+    float32 values: the RMS level and ``bins`` spectrum bands. The writer
+    fills a row before bumping the counter, so readers only look at rows the
+    counter has already published.
+    """
 
-    def __init__(self, path: Path, start_ms: int = 0, interval_ms: int = 100):
-        super().__init__()
-        self.path = path
-        self.start_ms = start_ms
-        self.interval_ms = interval_ms
-        self._running = True
+    HEADER = 16
 
-    def stop(self):
-        self._running = False
+    def __init__(self, slots=64, bins=32, name=None):
+        self.slots, self.bins = slots, bins
+        size = self.HEADER + slots * (1 + bins) * 4
+        # the spawned worker shares the parent's resource tracker, so
+        # attaching by name needs no extra bookkeeping
+        self.shm = shared_memory.SharedMemory(name=name, create=name is None, size=size)
+        self.name = self.shm.name
+        self.counter = np.ndarray((1,), dtype=np.int64, buffer=self.shm.buf)
+        self.frames = np.ndarray((slots, 1 + bins), dtype=np.float32,
+                                 buffer=self.shm.buf, offset=self.HEADER)
+        if name is None:
+            self.counter[0] = 0
 
-    def run(self):
-        ff = shutil.which("ffmpeg")
-        if not ff or not self.path:
-            return
-        pos = str(self.start_ms / 1000.0)
-        cmd = [ff, "-ss", pos, "-i", str(self.path), "-f", "s16le", "-ac", "1",
-               "-ar", "8000", "-loglevel", "quiet", "-"]
+    def write(self, level, spectrum):
+        n = int(self.counter[0])
+        row = self.frames[n % self.slots]
+        row[0] = level
+        row[1:1 + len(spectrum)] = spectrum
+        self.counter[0] = n + 1
+
+    def count(self):
+        return int(self.counter[0])
+
+    def frame(self, n):
+        """View (not a copy) of frame ``n``; valid while ``n`` is within ``slots`` of the counter."""
+        return self.frames[n % self.slots]
+
+    def close(self, unlink=False):
+        self.counter = self.frames = None
         try:
-            import audioop, time
-            proc = subprocess.Popen(cmd, stdout=subprocess.PIPE)
-            buf = int(8000 * (self.interval_ms/1000.0) * 2)
-            while self._running:
-                data = proc.stdout.read(buf)
-                if not data:
-                    break
-                rms = audioop.rms(data, 2) / 32768.0
-                self.level.emit(rms)
+            self.shm.close()
+        except BufferError:
+            pass
+        if unlink:
+            try:
+                self.shm.unlink()
+            except FileNotFoundError:
+                pass
+
+
+def _visualizer_worker(shm_name, slots, bins, interval_ms, commands):
+    """Child process: decode with ffmpeg and publish level/spectrum frames."""
+    import signal
+    if hasattr(signal, 'SIGTERM'):
+        signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    ring = LevelRing(slots, bins, name=shm_name)
+    ff = shutil.which("ffmpeg")
+    rate = 8000
+    n = int(rate * interval_ms / 1000)
+    window = np.hanning(n).astype(np.float32)
+    edges = np.unique((np.linspace(1, math.sqrt(n // 2 + 1), bins + 1) ** 2).astype(int))
+    spectrum = np.zeros(bins, dtype=np.float32)
+    proc = None
+
+    def kill():
+        if proc:
+            proc.kill()
             proc.stdout.close()
             proc.wait()
-        except Exception:
-            pass
+        return None
+
+    try:
+        while True:
+            try:
+                cmd = commands.get(block=proc is None)
+            except queue.Empty:
+                cmd = None
+            if cmd is not None:
+                proc = kill()
+                if cmd[0] == 'quit':
+                    break
+                if cmd[0] == 'play' and ff:
+                    _, path, start_ms = cmd
+                    args = [ff, "-re", "-ss", str(start_ms / 1000.0), "-i", path,
+                            "-f", "s16le", "-ac", "1", "-ar", str(rate),
+                            "-loglevel", "quiet", "-"]
+                    proc = subprocess.Popen(args, stdout=subprocess.PIPE)
+                continue
+            data = proc.stdout.read(n * 2)
+            if len(data) < n * 2:
+                proc = kill()
+                continue
+            x = np.frombuffer(data, dtype='<i2').astype(np.float32) / 32768.0
+            level = float(np.sqrt(np.mean(x * x)))
+            mag = np.abs(np.fft.rfft(x * window))
+            bands = np.add.reduceat(mag, edges[:-1]) / np.diff(edges)
+            db = 20 * np.log10(bands + 1e-9) - 20 * math.log10(n / 4)
+            spectrum[:len(db)] = np.clip((db + 60) / 60, 0, 1)
+            ring.write(level, spectrum)
+    except (KeyboardInterrupt, SystemExit):
+        pass
+    finally:
+        kill()
+        ring.close()
+
+
+class VisualizerProcess:
+    """Own the visualizer child process and the ring it writes into.
+
+    The process is spawned once and reused: ``play`` restarts ffmpeg at a new
+    position, ``stop`` halts decoding and ``close`` shuts everything down.
+    """
+
+    def __init__(self, interval_ms=100, slots=64, bins=32):
+        ctx = multiprocessing.get_context('spawn')
+        self.ring = LevelRing(slots, bins)
+        self.commands = ctx.Queue()
+        self.proc = ctx.Process(target=_visualizer_worker, daemon=True,
+                                args=(self.ring.name, slots, bins, interval_ms, self.commands))
+        self.proc.start()
+        RESOURCES.track('Process', self.proc)
+        RESOURCES.track('LevelRing', self.ring)
+
+    def play(self, path, start_ms=0):
+        self.commands.put(('play', str(path), max(0, start_ms)))
+
+    def stop(self):
+        self.commands.put(('stop',))
+
+    def close(self):
+        if self.proc is None:
+            return
+        self.commands.put(('quit',))
+        self.proc.join(2)
+        if self.proc.is_alive():
+            self.proc.terminate()
+            self.proc.join(1)
+        self.commands.close()
+        self.commands.join_thread()
+        self.proc = None
+        self.ring.close(unlink=True)
 
 
 class VisualizerWidget(QtWidgets.QWidget):
-    """Display audio levels fed from a background thread."""
+    """Display audio levels and spectrum read from a shared-memory ring."""
 
     def __init__(self, player, interval_ms=100):
         super().__init__()
@@ -271,7 +2028,8 @@ class VisualizerWidget(QtWidgets.QWidget):
         self.interval_ms = interval_ms
         self.mode = 0
         self.data = collections.deque([0]*200, maxlen=200)
-        self.current_level = 0.0
+        self.ring = None
+        self.seen = 0
 
         layout = QtWidgets.QVBoxLayout(self)
         if pg is None or np is None:
@@ -300,10 +2058,17 @@ class VisualizerWidget(QtWidgets.QWidget):
         self.timer.start(self.interval_ms)
         self.set_mode(self.mode)
 
-    @QtCore.pyqtSlot(float)
-    def add_level(self, level: float):
-        """Receive a new audio level from the worker thread."""
-        self.current_level = max(-1.0, min(1.0, level))
+    def attach_ring(self, ring):
+        self.ring = ring
+        self.seen = ring.count() if ring else 0
+
+    def detach_ring(self):
+        self.ring = None
+
+    def reset(self):
+        """Forget the previous book's levels before showing a new one."""
+        self.data.extend([0] * self.data.maxlen)
+        self.seen = self.ring.count() if self.ring else 0
 
     def _update_stats(self):
         if psutil:
@@ -314,16 +2079,24 @@ class VisualizerWidget(QtWidgets.QWidget):
 
     def _update_plot(self):
         self._update_stats()
-        if pg is None or np is None:
+        if pg is None or np is None or self.ring is None:
+            return
+        count = self.ring.count()
+        if count == self.seen:
             return
-        self.data.append(self.current_level)
+        # frames older than one lap have been overwritten already
+        first = max(self.seen, count - self.ring.slots + 1)
+        for n in range(first, count):
+            self.data.append(float(self.ring.frame(n)[0]))
+        self.seen = count
         arr = np.array(self.data)
         if self.mode == 0:
             x = np.arange(len(arr))
             self.line.setData(x, arr)
         elif self.mode == 1:
-            x = np.arange(len(arr))
-            self.bar_item.setOpts(x=x, height=arr)
+            # pyqtgraph keeps the array it is given, so hand it a copy of the bands
+            spec = np.array(self.ring.frame(count - 1)[1:])
+            self.bar_item.setOpts(x=np.arange(len(spec)), height=spec)
         else:
             theta = np.linspace(0, 2*np.pi, len(arr), endpoint=False)
             r = 0.5 + arr
@@ -352,8 +2125,8 @@ class VisualizerWidget(QtWidgets.QWidget):
             self.line.setSymbolBrush('c')
 
     def closeEvent(self, e):
-        if hasattr(self.player, '_stop_vis_thread'):
-            self.player._stop_vis_thread()
+        if hasattr(self.player, '_close_visualizer'):
+            self.player._close_visualizer()
         super().closeEvent(e)
 
 
@@ -372,11 +2145,13 @@ class VisualizerWindow(QtWidgets.QDialog):
         self.resize(500, 500)
 
     def closeEvent(self, e):
-        if hasattr(self.player, '_stop_vis_thread'):
-            self.player._stop_vis_thread()
+        if hasattr(self.player, '_close_visualizer'):
+            self.player._close_visualizer()
         super().closeEvent(e)
 
 class Player(QtWidgets.QMainWindow):
+    end_reached = QtCore.pyqtSignal()
+
     def __init__(self, vlc_inst, probe_cmd):
         super().__init__()
         self.vlc_inst, self.probe_cmd = vlc_inst, probe_cmd
@@ -385,24 +2160,46 @@ class Player(QtWidgets.QMainWindow):
         if ico_path:
             icon = QtGui.QIcon(str(ico_path))
         else:
-            icon = self.style().standardIcon(QtWidgets.QStyle.SP_FileIcon)
+            icon = self.style().standardIcon(QtWidgets.QStyle.StandardPixmap.SP_FileIcon)
         self.setWindowIcon(icon)
         self.setGeometry(100, 100, 900, 650)
 
-        # ensure the media player object exists
-        self.player = self.vlc_inst.media_player_new()
+        # one player for the lifetime of the window; books swap media into it
+        self.player = RESOURCES.new_player(self.vlc_inst)
+        self.player.event_manager().event_attach(
+            vlc.EventType.MediaPlayerEndReached, lambda _: self.end_reached.emit())
 
         self.resume_db = load_resume()
         self.resume_db.setdefault('__bookmarks__', [])
+        self.sessions = SessionLog()
+        self.books = BookIndex(self.resume_db, self.sessions)
+        self.books.migrate_legacy()
         self.current_file = None
+        self.current_book = None
+        self.play_path = None
+        self.cache = BookCache(budget=self.resume_db.get('cache_budget_mb', 4096) << 20)
+        self.jobs = JobScheduler()
+        self.cache_jobs = []
+        self.export_job = None
+        self.prepared = None
+        self.prepare_job = None
+        self.resume_db.setdefault('__queue__', [])
+        self.end_reached.connect(self._on_end_reached)
         self.chapters = []
+        self.chapter_info = []
         self.audio_tracks = []
-        self.tts = pyttsx3.init()
         self.prev_time = 0
         self.play_btn = None
         self.images = []
         self.vis_win = None
-        self.vis_thread = None
+        self.vis_proc = None
+        self.scrub = SeekThrottle(self.player.set_time)
+        self.scrub_timer = QtCore.QTimer(self)
+        self.scrub_timer.setSingleShot(True)
+        self.scrub_timer.setInterval(SCRUB_SEEK_MS)
+        self.scrub_timer.timeout.connect(self.scrub.flush)
+        self._envelope = (None, None)
+        self._span = None
 
         self._build_ui()
         self._apply_font_sizes()
@@ -437,8 +2234,25 @@ class Player(QtWidgets.QMainWindow):
         v.addWidget(QtWidgets.QLabel("📚 Bookshelf"))
         self.shelf_list = QtWidgets.QListWidget()
         self.shelf_list.itemClicked.connect(self._open_from_shelf)
+        self.shelf_list.setContextMenuPolicy(QtCore.Qt.ContextMenuPolicy.CustomContextMenu)
+        self.shelf_list.customContextMenuRequested.connect(self._shelf_menu)
         v.addWidget(self.shelf_list)
 
+        # Up next
+        qh = QtWidgets.QHBoxLayout()
+        qh.addWidget(QtWidgets.QLabel("Up Next:"))
+        self.next_lbl = QtWidgets.QLabel("—")
+        qh.addWidget(self.next_lbl, 1)
+        self.queue_combo = QtWidgets.QComboBox()
+        self.queue_combo.addItems(["Queue", "Series"])
+        self.queue_combo.setCurrentIndex(1 if self.resume_db.get('queue_mode') == 'series' else 0)
+        self.queue_combo.currentIndexChanged.connect(self._set_queue_mode)
+        qh.addWidget(self.queue_combo)
+        next_btn = QtWidgets.QPushButton("Next ▶▶")
+        next_btn.clicked.connect(self.play_next)
+        qh.addWidget(next_btn)
+        v.addLayout(qh)
+
         # Cover + title
         hb2 = QtWidgets.QHBoxLayout()
         self.cover_lbl = ClickableLabel()
@@ -454,7 +2268,8 @@ class Player(QtWidgets.QMainWindow):
         for text, func in [("▶", self.play_pause),
                            ("« 10s", lambda: self.skip(-10000)),
                            ("10s »", lambda: self.skip(10000)),
-                           ("Bookmarks", self.open_bookmarks)]:
+                           ("Bookmarks", self.open_bookmarks),
+                           ("Stats", self.open_stats)]:
             btn = QtWidgets.QPushButton(text)
             if text == "▶":
                 self.play_btn = btn
@@ -466,7 +2281,9 @@ class Player(QtWidgets.QMainWindow):
         self.slider = QtWidgets.QSlider(QtCore.Qt.Orientation.Horizontal)
         self.slider.setObjectName("timeSlider")
         self.slider.setRange(0, 1)
-        self.slider.sliderMoved.connect(self.seek)
+        self.slider.sliderPressed.connect(self._scrub_begin)
+        self.slider.sliderMoved.connect(self._scrub_move)
+        self.slider.sliderReleased.connect(self._scrub_end)
         v.addWidget(self.slider)
 
         # Time edit + Go
@@ -482,6 +2299,8 @@ class Player(QtWidgets.QMainWindow):
         v.addLayout(th)
         self.continue_lbl = QtWidgets.QLabel("Continue From: 00:00:00")
         v.addWidget(self.continue_lbl)
+        self.cache_lbl = QtWidgets.QLabel()
+        v.addWidget(self.cache_lbl)
 
         # Volume slider
         vh = QtWidgets.QHBoxLayout()
@@ -507,7 +2326,12 @@ class Player(QtWidgets.QMainWindow):
         v.addLayout(sh)
 
         # Chapters
-        v.addWidget(QtWidgets.QLabel("Chapters"))
+        chh = QtWidgets.QHBoxLayout()
+        chh.addWidget(QtWidgets.QLabel("Chapters"), 1)
+        self.export_btn = QtWidgets.QPushButton("Export Chapters…")
+        self.export_btn.clicked.connect(self.export_chapters)
+        chh.addWidget(self.export_btn)
+        v.addLayout(chh)
         self.ch_list = QtWidgets.QListWidget()
         self.ch_list.itemClicked.connect(self.goto_chapter)
         v.addWidget(self.ch_list)
@@ -541,82 +2365,104 @@ class Player(QtWidgets.QMainWindow):
         if f:
             self.load_media(Path(f))
 
-    def load_media(self, path: Path):
-        if hasattr(self, 'player') and self.player is not None:
-            try:
-                self.player.stop()
-            except Exception:
-                pass
+    def load_media(self, path: Path, prepared=None, autoplay=False):
+        if self.current_book:
+            # whatever was still loading for the previous book is no longer wanted
+            self.jobs.cancel_book(self.current_book)
+        self._end_span()
+        self.player.stop()
         self.current_file = str(path)
-        m = self.vlc_inst.media_new(self.current_file)
-        self.player = self.vlc_inst.media_player_new()
+        self.current_book = self.books.identify(path)
+        local = self.cache.local_path(self.current_book) if self.resume_db.get('cache_enabled') else None
+        self.play_path = str(local or path)
+        if prepared and (prepared.path != self.current_file or prepared.media_path != self.play_path):
+            prepared.release()
+            prepared = None
+        m = prepared.media if prepared else RESOURCES.new_media(self.vlc_inst, self.play_path)
+        pos = self._resume_position()
+        if autoplay and pos:
+            # start straight at the resume point, no pause/seek round trip
+            m.add_option(f":start-time={pos / 1000:.3f}")
+        # the player keeps its own reference; the previous media is freed on the swap
         self.player.set_media(m)
-        # preload & volume
-        self.player.play(); QtCore.QThread.msleep(200); self.player.pause()
+        if prepared:
+            prepared.release()
+        else:
+            RESOURCES.release_media(m)
+        if autoplay:
+            self.player.play()
+        else:
+            # preload & volume
+            self.player.play(); QtCore.QThread.msleep(200); self.player.pause()
         self.player.audio_set_volume(self.resume_db.get('volume', 100))
-        if self.vis_thread:
-            self.vis_thread.stop()
-            self.vis_thread.wait()
-            self.vis_thread = None
+        self._stop_visualizer()
         if self.vis_win:
-            self.vis_win.widget.setParent(None)
-            self.vis_win.widget = VisualizerWidget(self)
-            self.vis_win.layout().insertWidget(0, self.vis_win.widget, 1)
-            try:
-                self.vis_win.mode_combo.currentIndexChanged.disconnect()
-            except TypeError:
-                pass
-            self.vis_win.mode_combo.currentIndexChanged.connect(self.vis_win.widget.set_mode)
-            self.vis_win.widget.set_mode(self.vis_win.mode_combo.currentIndex())
-            self._start_vis_thread()
-        length = self.player.get_length()
+            self.vis_win.widget.reset()
+            self._start_visualizer(pos)
+        length = prepared.duration if prepared and prepared.duration > 0 else self.player.get_length()
         self.slider.setRange(0, length or 1)
+        if length > 0:
+            self.resume_db.setdefault('__lengths__', {})[self.current_book] = length
 
-        self._load_metadata(path)
-        if hasattr(self, '_load_chapters'):
+        if prepared:
+            self._show_metadata(prepared.tags, prepared.images)
+            self._show_chapters(prepared.chapters)
+        else:
+            self._load_metadata(path)
             self._load_chapters(path)
         if hasattr(self, '_load_audio_streams'):
             self._load_audio_streams()
 
-        pos = self.resume_db.get(self.current_file, 0)
-        self.player.set_time(pos)
+        if not autoplay:
+            self.player.set_time(pos)
         self.continue_lbl.setText(f"Continue From: {pos//3600000:02d}:{(pos//60000)%60:02d}:{(pos//1000)%60:02d}")
         self.meta_lbl.setText(f"<b>{path.name}</b>")
 
-        self.resume_db['__last_book__'] = self.current_file
+        self.resume_db['__last_book__'] = self.current_book
 
         shelf = self.resume_db['__bookshelf__']
-        if self.current_file not in shelf:
-            shelf.append(self.current_file)
+        if self.current_book not in shelf:
+            shelf.append(self.current_book)
         save_resume(self.resume_db)
         self._refresh_shelf()
         if self.play_btn:
-            self.play_btn.setText("▶")
+            self.play_btn.setText("❚❚" if autoplay else "▶")
+        if autoplay:
+            self._begin_span(pos)
+        queue = self.resume_db['__queue__']
+        if self.current_book in queue:
+            queue.remove(self.current_book)
+        self._start_caching()
+        self._prepare_next()
+
+    def _resume_position(self):
+        """Saved position of the current book, or a newer one from an aligned edition."""
+        db = self.resume_db
+        stamps = db.get('__stamps__', {})
+        pos, ts = db.get(self.current_book, 0), stamps.get(self.current_book, 0)
+        for other in aligned_editions(db, self.current_book):
+            if stamps.get(other, 0) > ts and isinstance(db.get(other), int):
+                pos = translate_position(db, other, self.current_book, db[other])
+                ts = stamps[other]
+        return pos
 
     def _load_metadata(self, path: Path):
+        self._show_metadata({}, [])
+        self.jobs.submit(read_metadata, path, priority=PRIORITY_CURRENT, book=self.current_book,
+                         on_done=lambda res: self._show_metadata(*res))
+
+    def _show_metadata(self, tags, images):
         self.meta_tree.clear()
         self.cover_lbl.clear()
-        self.images = []
-        try:
-            audio = MP4(str(path)) if path.suffix.lower() in ('.m4b', '.mp4', '.m4a') else AFile(str(path))
-            tags = dict(audio.tags or {})
-            cov = audio.tags.get('covr')
-            if cov:
-                imgs = cov if isinstance(cov, list) else [cov]
-                for data in imgs:
-                    qimg = QtGui.QImage.fromData(bytes(data))
-                    if not qimg.isNull():
-                        self.images.append(qimg)
-                if self.images:
-                    pix = QtGui.QPixmap.fromImage(self.images[0]).scaled(100, 100, QtCore.Qt.AspectRatioMode.KeepAspectRatio)
-                    self.cover_lbl.setPixmap(pix)
-            for k, v in tags.items():
-                text = str(v)
-                if k == 'covr' and len(text) > 300:
-                    text = text[:300] + '…'
-                QtWidgets.QTreeWidgetItem(self.meta_tree, [k, text])
-        except:
-            pass
+        self.images = list(images)
+        if self.images:
+            pix = QtGui.QPixmap.fromImage(self.images[0]).scaled(100, 100, QtCore.Qt.AspectRatioMode.KeepAspectRatio)
+            self.cover_lbl.setPixmap(pix)
+        for k, v in tags.items():
+            text = str(v)
+            if k == 'covr' and len(text) > 300:
+                text = text[:300] + '…'
+            QtWidgets.QTreeWidgetItem(self.meta_tree, [k, text])
 
 
     def _show_meta_full(self, item, _):
@@ -627,32 +2473,74 @@ class Player(QtWidgets.QMainWindow):
         txt = QtWidgets.QTextEdit(val)
         txt.setReadOnly(True)
         ly.addWidget(txt)
+        speaking = []
         if key.lower() in ('desc', 'description'):
             btn = QtWidgets.QPushButton("Read Text")
-            btn.clicked.connect(lambda: self.tts.say(txt.toPlainText()) or self.tts.runAndWait())
+            btn.clicked.connect(lambda: speaking.append(self.jobs.submit(
+                speak, txt.toPlainText(), priority=PRIORITY_CURRENT, book=self.current_book,
+                resources=('tts',), cancellable=True)))
             ly.addWidget(btn)
         dlg.resize(400, 300)
         dlg.exec()
+        for job in speaking:
+            job.cancel()
+        dlg.deleteLater()
 
     def _load_chapters(self, path: Path):
+        self._show_chapters([])
+        if self.probe_cmd:
+            self.jobs.submit(probe_chapters, self.probe_cmd, path, priority=PRIORITY_CURRENT,
+                             book=self.current_book, resources=('ffmpeg',),
+                             on_done=self._show_chapters)
+
+    def _show_chapters(self, chapters):
+        self.chapter_info = list(chapters)
         self.chapters.clear()
         self.ch_list.clear()
-        if not self.probe_cmd:
+        for c in chapters:
+            ms, title = c['start'], c['title']
+            itm = QtWidgets.QListWidgetItem(f"{ms//60000}:{(ms//1000)%60:02d}  {title}")
+            itm.setData(QtCore.Qt.ItemDataRole.UserRole, ms)
+            self.ch_list.addItem(itm)
+            self.chapters.append((ms, title))
+
+    def export_chapters(self):
+        if not self.current_file or self.export_job:
             return
-        try:
-            res = subprocess.run(
-                [self.probe_cmd, '-v', 'quiet', '-print_format', 'json', '-show_chapters', str(path)],
-                capture_output=True, check=True)
-            obj = json.loads(res.stdout)
-            for c in obj.get('chapters', []):
-                ms = int(float(c['start_time']) * 1000)
-                title = c.get('tags', {}).get('title', f"Chapter {len(self.chapters)+1}")
-                itm = QtWidgets.QListWidgetItem(f"{ms//60000}:{(ms//1000)%60:02d}  {title}")
-                itm.setData(QtCore.Qt.ItemDataRole.UserRole, ms)
-                self.ch_list.addItem(itm)
-                self.chapters.append((ms, title))
-        except:
-            pass
+        chapters = self.chapter_info
+        if not chapters:
+            QtWidgets.QMessageBox.information(self, "Export Chapters", "This book has no chapters.")
+            return
+        out_dir = QtWidgets.QFileDialog.getExistingDirectory(self, "Export chapters to")
+        if not out_dir:
+            return
+        out_dir = Path(out_dir) / _safe_name(Path(self.current_file).stem)
+        dlg = QtWidgets.QProgressDialog("Exporting chapters…", "Cancel", 0, len(chapters), self)
+        dlg.setWindowTitle("Export Chapters")
+        dlg.setMinimumDuration(0)
+        # leave one ffmpeg slot free for probing whatever book gets opened meanwhile
+        workers = max(1, self.jobs.limits['ffmpeg'] - 1)
+
+        def progress(done, total, size, secs):
+            dlg.setValue(done)
+            dlg.setLabelText(f"Exported {done}/{total} chapters  ({size/1e6/max(secs, 1e-3):.1f} MB/s)")
+
+        def finished(result):
+            written, errors = result or ([], [])
+            dlg.reset()
+            msg = f"Wrote {len(written)} of {len(chapters)} chapters to {out_dir}."
+            if errors:
+                msg += "\n\n" + "\n".join(errors[:5])
+            QtWidgets.QMessageBox.information(self, "Export Chapters", msg)
+            dlg.deleteLater()
+            self.export_job = None
+
+        self.export_job = self.jobs.submit(
+            export_chapters, self.play_path, out_dir, chapters, workers,
+            priority=PRIORITY_MAINTENANCE, resources={'ffmpeg': workers}, cancellable=True,
+            on_progress=progress, on_done=finished, on_cancel=finished,
+            on_error=lambda exc: finished(([], [str(exc)])))
+        dlg.canceled.connect(self.export_job.cancel)
 
     def _load_audio_streams(self):
         self.audio_tracks.clear()
@@ -693,7 +2581,10 @@ class Player(QtWidgets.QMainWindow):
             try:
                 h, m, s = map(int, parts)
                 ms = (h*3600 + m*60 + s) * 1000
+                self._end_span()
                 self.player.set_time(ms)
+                if self.player.is_playing():
+                    self._begin_span(ms)
                 length = self.player.get_length()
                 if length > 0:
                     self.slider.setRange(0, length)
@@ -728,50 +2619,124 @@ class Player(QtWidgets.QMainWindow):
             QtWidgets.QMessageBox.information(self, "No Book Loaded", "Please open an audio book first.")
             return
         if self.player.is_playing():
+            self._end_span()
             self.player.pause()
             self.play_btn.setText("▶")
-            self._stop_vis_thread()
+            self._stop_visualizer()
         else:
             self.player.play()
+            self._begin_span()
             self.play_btn.setText("❚❚")
-            self._start_vis_thread()
+            self._start_visualizer()
 
     def skip(self, msec):
         if self.current_file:
             t = self.player.get_time() + msec
+            self._end_span()
             self.player.set_time(max(0, t))
             if self.player.is_playing():
-                self._start_vis_thread()
+                self._begin_span(max(0, t))
+                self._start_visualizer()
 
     def next_chapter(self):
         now = self.player.get_time()
         for t, _ in self.chapters:
             if t > now:
+                self._end_span()
                 self.player.set_time(t)
+                if self.player.is_playing():
+                    self._begin_span(t)
                 break
 
     def goto_chapter(self, item):
-        self.player.set_time(item.data(QtCore.Qt.ItemDataRole.UserRole))
+        ms = item.data(QtCore.Qt.ItemDataRole.UserRole)
+        self._end_span()
+        self.player.set_time(ms)
         if self.player.is_playing():
-            self._start_vis_thread()
+            self._begin_span(ms)
+            self._start_visualizer()
 
     def seek(self, pos):
         if self.current_file:
+            self._end_span()
             self.player.set_time(pos)
             if self.player.is_playing():
-                self._start_vis_thread()
+                self._begin_span(pos)
+                self._start_visualizer()
+
+    def _scrub_begin(self):
+        if not self.current_file:
+            return
+        # playback spans and the visualizer pick up again at the final position
+        self._end_span()
+        self._stop_visualizer()
+        if self._envelope[0] != self.current_book:
+            self._envelope = (self.current_book, cached_envelope(self.current_book))
+
+    def _scrub_move(self, pos):
+        if not self.current_file:
+            return
+        self.scrub.move(pos)
+        if self.scrub.pending is not None:
+            # seek there anyway if the drag pauses before the handle is let go
+            self.scrub_timer.start()
+        self._show_scrub_preview(pos)
+
+    def _scrub_end(self):
+        self.scrub_timer.stop()
+        self.scrub.pending = None
+        QtWidgets.QToolTip.hideText()
+        self.seek(self.slider.value())
+
+    def _show_scrub_preview(self, pos):
+        text = fmt_ms(pos)
+        starts = [t for t, _ in self.chapters]
+        i = bisect.bisect_right(starts, pos)
+        if i:
+            text += f"  {self.chapters[i - 1][1]}"
+        env = self._envelope[1]
+        if env is not None:
+            text += "\n" + level_sketch(env, pos)
+        QtWidgets.QToolTip.showText(QtGui.QCursor.pos() + QtCore.QPoint(0, -48), text, self.slider)
+
+    def _begin_span(self, pos=None):
+        """Start recording a listening span at ``pos`` (default: now)."""
+        if not self.current_file:
+            return
+        if pos is None:
+            pos = self.player.get_time()
+        self._span = (max(0, pos), time.time(), self.player.get_rate() or 1.0)
+
+    def _end_span(self):
+        """Close the open listening span and append it to the session log."""
+        if self._span is None or not self.current_file:
+            self._span = None
+            return
+        start, wall, rate = self._span
+        self._span = None
+        if self.player.get_state() == vlc.State.Ended:
+            end = self.player.get_length()
+        else:
+            end = self.player.get_time()
+        try:
+            self.sessions.append(self.current_book, start, end, rate, wall)
+        except OSError:
+            pass
 
     def _update_ui(self):
         if not self.current_file:
             return
-        self.slider.blockSignals(True)
+        if self._span and self.player.get_state() in (vlc.State.Ended, vlc.State.Stopped, vlc.State.Error):
+            self._end_span()
         ms = self.player.get_time()
-        self.slider.setValue(ms)
-        self.slider.blockSignals(False)
+        if not self.slider.isSliderDown():
+            self.slider.blockSignals(True)
+            self.slider.setValue(ms)
+            self.slider.blockSignals(False)
         if self.player.is_playing() and not self.time_edit.hasFocus():
             s = ms // 1000
             self.time_edit.setText(f"{s//3600:02d}:{(s%3600)//60:02d}:{s%60:02d}")
-        self.resume_db[self.current_file] = self.player.get_time()
+        set_position(self.resume_db, self.current_book, self.player.get_time())
         self.continue_lbl.setText(f"Continue From: {ms//3600000:02d}:{(ms//60000)%60:02d}:{(ms//1000)%60:02d}")
         save_resume(self.resume_db)
 
@@ -781,16 +2746,275 @@ class Player(QtWidgets.QMainWindow):
 
     def _refresh_shelf(self):
         self.shelf_list.clear()
-        valid = [p for p in self.resume_db['__bookshelf__'] if Path(p).exists()]
+        # moved books stay on the shelf until they are relocated
+        valid = [b for b in self.resume_db['__bookshelf__'] if self.books.path_of(b)]
         self.resume_db['__bookshelf__'] = valid
         save_resume(self.resume_db)
-        for p in valid:
-            itm = QtWidgets.QListWidgetItem(Path(p).name)
-            itm.setData(QtCore.Qt.ItemDataRole.UserRole, p)
+        for b in valid:
+            if self.books.exists(b):
+                itm = QtWidgets.QListWidgetItem(self.books.name_of(b))
+            else:
+                itm = QtWidgets.QListWidgetItem(f"{self.books.name_of(b)} (missing)")
+                itm.setForeground(QtGui.QColor('#888888'))
+            itm.setData(QtCore.Qt.ItemDataRole.UserRole, b)
             self.shelf_list.addItem(itm)
 
     def _open_from_shelf(self, item):
-        self.load_media(Path(item.data(QtCore.Qt.ItemDataRole.UserRole)))
+        book = item.data(QtCore.Qt.ItemDataRole.UserRole)
+        if not self.books.exists(book):
+            ans = QtWidgets.QMessageBox.question(
+                self, "Missing Book",
+                f"{self.books.name_of(book)} was moved or renamed. Search a folder for it?")
+            if ans == QtWidgets.QMessageBox.StandardButton.Yes:
+                self.relocate_library()
+            if not self.books.exists(book):
+                return
+        self.load_media(Path(self.books.path_of(book)))
+
+    def _start_caching(self):
+        """Queue the current book and the next few on the shelf for local caching."""
+        self._stop_caching()
+        if not self.resume_db.get('cache_enabled') or not self.current_book:
+            self.cache_lbl.clear()
+            return
+        self.cache.budget = self.resume_db.get('cache_budget_mb', 4096) << 20
+        shelf = self.resume_db['__bookshelf__']
+        wanted = [self.current_book]
+        if self.current_book in shelf:
+            after = shelf[shelf.index(self.current_book) + 1:]
+            wanted += [b for b in after if self.books.exists(b)][:self.resume_db.get('cache_prefetch', 0)]
+        throttle = self.resume_db.get('cache_throttle_kbps', 0) * 1024
+        for bid in wanted:
+            src = self.books.path_of(bid)
+            if not src or not Path(src).exists() or self.cache.local_path(bid):
+                continue
+            part = self.cache.begin(bid, src)
+            if not self.cache.make_room(bid, keep=wanted):
+                self.cache.remove(bid)
+                continue
+            self.cache_jobs.append(self.jobs.submit(
+                cache_copy, src, str(part), throttle, book=bid, resources=('disk',),
+                priority=PRIORITY_CURRENT if bid == self.current_book else PRIORITY_PREFETCH,
+                cancellable=True,
+                on_progress=lambda d, t, r, b=bid: self._on_cache_progress(b, d / t, r),
+                on_done=lambda ok, b=bid: ok and self._on_cache_done(b),
+                on_error=lambda exc: self.cache_lbl.setText(f"Caching failed: {exc}")))
+        if not self.cache_jobs:
+            self.cache_lbl.clear()
+
+    def _stop_caching(self):
+        # no waiting here: cache_copy serialises copies into the same .part file
+        for job in self.cache_jobs:
+            job.cancel()
+        self.cache_jobs = []
+
+    def _on_cache_progress(self, bid, frac, rate):
+        self.cache_lbl.setText(f"Caching {self.books.name_of(bid)[:40]}: {frac*100:.0f}% ({rate/1e6:.1f} MB/s)")
+
+    def _on_cache_done(self, bid):
+        self.cache.complete(bid)
+        self.cache_lbl.setText(f"Cached {self.books.name_of(bid)[:40]}")
+        if bid == self.current_book:
+            self._switch_to_local()
+
+    def _switch_to_local(self):
+        """Move playback of the current book over to its complete local copy."""
+        local = self.cache.local_path(self.current_book)
+        if not local or self.play_path == str(local):
+            return
+        playing = self.player.is_playing()
+        self._end_span()
+        pos = self.player.get_time()
+        self.play_path = str(local)
+        m = RESOURCES.new_media(self.vlc_inst, self.play_path)
+        self.player.set_media(m)
+        RESOURCES.release_media(m)
+        self.player.play(); QtCore.QThread.msleep(200)
+        self.player.set_time(pos)
+        if playing:
+            self._begin_span(pos)
+            self._start_visualizer()
+        else:
+            self.player.pause()
+
+    def _set_cache_option(self, key, val):
+        self.resume_db[key] = val
+        save_resume(self.resume_db)
+        self._start_caching()
+
+    def _next_path(self):
+        if not self.current_file:
+            return None
+        if self.resume_db.get('queue_mode') == 'series':
+            return series_next(self.current_file)
+        for bid in self.resume_db['__queue__']:
+            if bid != self.current_book and self.books.exists(bid):
+                return self.books.path_of(bid)
+        return None
+
+    def _prepare_next(self):
+        """Parse the next book in the background so switching to it is instant."""
+        path = self._next_path()
+        self.next_lbl.setText(Path(path).name if path else "—")
+        if self.prepared and self.prepared.path == path:
+            return
+        if self.prepare_job and self.prepare_job.args[1] == path:
+            return
+        self._drop_prepared()
+        if not path:
+            return
+        bid = self.books.by_path.get(path)
+        local = self.cache.local_path(bid) if bid and self.resume_db.get('cache_enabled') else None
+        self.prepare_job = self.jobs.submit(
+            prepare_book, self.vlc_inst, path, str(local or path), self.probe_cmd,
+            priority=PRIORITY_PREFETCH, book=bid, resources=('ffmpeg',), cancellable=True,
+            on_done=self._on_prepared, on_cancel=self._discard_prepared)
+
+    def _on_prepared(self, book):
+        if self.prepare_job is None or self.prepare_job.result is not book:
+            self._discard_prepared(book)
+            return
+        self.prepare_job = None
+        self.prepared = book
+
+    def _discard_prepared(self, book):
+        if book and not book.claimed:
+            book.release()
+
+    def _drop_prepared(self):
+        if self.prepare_job:
+            self.prepare_job.cancel()
+            self.prepare_job = None
+        if self.prepared:
+            self.prepared.release()
+            self.prepared = None
+
+    def play_next(self):
+        path = self._next_path()
+        if not path:
+            return
+        prepared, self.prepared = self.prepared, None
+        job = self.prepare_job
+        if prepared is None and job and job.args[1] == path and job.started:
+            # still parsing; waiting is no slower than starting over
+            self.prepare_job = None
+            job.wait()
+            prepared = job.result
+            if prepared:
+                prepared.claimed = True
+        self._drop_prepared()
+        self.load_media(Path(path), prepared=prepared, autoplay=True)
+
+    def _on_end_reached(self):
+        self._end_span()
+        if self.current_book:
+            length = self.resume_db.get('__lengths__', {}).get(self.current_book)
+            if length:
+                set_position(self.resume_db, self.current_book, length)
+        if self._next_path():
+            self.play_next()
+        elif self.play_btn:
+            self.play_btn.setText("▶")
+
+    def _set_queue_mode(self, idx):
+        self.resume_db['queue_mode'] = 'series' if idx == 1 else 'manual'
+        save_resume(self.resume_db)
+        self._prepare_next()
+
+    def _shelf_menu(self, point):
+        item = self.shelf_list.itemAt(point)
+        queue = self.resume_db['__queue__']
+        menu = QtWidgets.QMenu(self)
+        if item:
+            bid = item.data(QtCore.Qt.ItemDataRole.UserRole)
+            if bid in queue:
+                menu.addAction("Remove from Up Next", lambda: queue.remove(bid))
+            else:
+                menu.addAction("Add to Up Next", lambda: queue.append(bid))
+            if self.current_book and bid != self.current_book and self.books.exists(bid):
+                menu.addAction("Align with Current Book", lambda: self.align_editions(bid))
+        if queue:
+            menu.addAction("Clear Up Next", queue.clear)
+        if menu.exec(self.shelf_list.mapToGlobal(point)):
+            save_resume(self.resume_db)
+            self._prepare_next()
+
+    def align_editions(self, other):
+        """Map positions between the current book and another edition of it."""
+        if np is None or not shutil.which('ffmpeg'):
+            QtWidgets.QMessageBox.information(self, "Align Editions",
+                                              "Aligning editions needs numpy and ffmpeg.")
+            return
+        book = self.current_book
+        names = f"{self.books.name_of(book)} and {self.books.name_of(other)}"
+        dlg = QtWidgets.QProgressDialog(f"Aligning {names}…", "Cancel", 0, 0, self)
+        dlg.setWindowTitle("Align Editions")
+        dlg.setMinimumDuration(0)
+        workers = max(1, self.jobs.limits['ffmpeg'] - 1)
+        job = None
+
+        def finished(anchors):
+            dlg.reset()
+            dlg.deleteLater()
+            if anchors is None:
+                return
+            if not anchors:
+                QtWidgets.QMessageBox.information(self, "Align Editions",
+                                                  f"No matching audio found in {names}.")
+                return
+            store_alignment(self.resume_db, book, other, anchors)
+            save_resume(self.resume_db)
+            QtWidgets.QMessageBox.information(
+                self, "Align Editions",
+                f"Matched {len(anchors)} points in {names}. Positions and bookmarks now carry over.")
+
+        def failed(exc):
+            dlg.reset()
+            dlg.deleteLater()
+            QtWidgets.QMessageBox.warning(self, "Align Editions", str(exc))
+
+        def correlate(envs):
+            # decoding is ffmpeg's work; the correlation itself is CPU bound
+            nonlocal job
+            if envs is None:
+                finished(None)
+                return
+            job = self.jobs.submit(
+                align_envelopes, *envs, priority=PRIORITY_MAINTENANCE, process=True,
+                on_done=finished, on_cancel=lambda _: finished(None), on_error=failed)
+
+        job = self.jobs.submit(
+            edition_envelopes, self.play_path, str(self.cache.local_path(other) or self.books.path_of(other)),
+            book, other, workers, priority=PRIORITY_MAINTENANCE, resources={'ffmpeg': workers},
+            cancellable=True, on_done=correlate, on_cancel=lambda _: finished(None), on_error=failed)
+        dlg.canceled.connect(lambda: job.cancel())
+
+    def relocate_library(self):
+        folder = QtWidgets.QFileDialog.getExistingDirectory(self, "Select folder containing moved books")
+        if not folder:
+            return
+        missing = len(self.books.missing())
+        dlg = QtWidgets.QProgressDialog("Searching for moved books…", "Cancel", 0, 0, self)
+        dlg.setWindowTitle("Relocate Library")
+        dlg.setMinimumDuration(0)
+
+        def finished(matches):
+            dlg.reset()
+            dlg.deleteLater()
+            found = self.books.link(matches or [])
+            save_resume(self.resume_db)
+            self._refresh_shelf()
+            QtWidgets.QMessageBox.information(self, "Relocate Library",
+                                              f"Re-linked {found} of {missing} missing books.")
+
+        job = self.jobs.submit(
+            find_books, self.books.missing_by_size(), [folder],
+            priority=PRIORITY_MAINTENANCE, resources=('disk',), cancellable=True,
+            on_progress=lambda scanned, found: dlg.setLabelText(
+                f"Scanned {scanned} files, found {found} of {missing} books…"),
+            on_done=finished, on_cancel=finished,
+            on_error=lambda exc: finished([]))
+        dlg.canceled.connect(job.cancel)
 
     # removed system tray support
 
@@ -823,7 +3047,7 @@ class Player(QtWidgets.QMainWindow):
     def _load_last_book(self):
         last = self.resume_db.get('__last_book__')
         if last:
-            p = Path(last)
+            p = Path(self.books.path_of(last) or last)
             if p.exists():
                 self.load_media(p)
             else:
@@ -832,6 +3056,16 @@ class Player(QtWidgets.QMainWindow):
     def open_bookmarks(self):
         dlg = BookmarkDialog(self)
         dlg.exec()
+        dlg.deleteLater()
+
+    def open_stats(self):
+        self._end_span()
+        if self.player.is_playing():
+            self._begin_span()
+        dlg = StatsDialog(self)
+        dlg.resize(500, 400)
+        dlg.exec()
+        dlg.deleteLater()
 
     def open_gallery(self):
         if not self.images:
@@ -839,41 +3073,40 @@ class Player(QtWidgets.QMainWindow):
         dlg = GalleryDialog(self.images, self)
         dlg.resize(400, 300)
         dlg.exec()
+        dlg.deleteLater()
 
     def open_visualizer(self):
         if self.vis_win is None:
             self.vis_win = VisualizerWindow(self)
         else:
-            self.vis_win.widget.setParent(None)
-            self.vis_win.widget = VisualizerWidget(self)
-            self.vis_win.layout().insertWidget(0, self.vis_win.widget, 1)
-            try:
-                self.vis_win.mode_combo.currentIndexChanged.disconnect()
-            except TypeError:
-                pass
-            self.vis_win.mode_combo.currentIndexChanged.connect(self.vis_win.widget.set_mode)
-            self.vis_win.widget.set_mode(self.vis_win.mode_combo.currentIndex())
+            self.vis_win.widget.reset()
+        self.vis_win.widget.timer.start()
         self.vis_win.show()
         self.vis_win.raise_()
-        self._start_vis_thread()
+        self._start_visualizer()
 
-    def _start_vis_thread(self):
-        if self.vis_win is None or pg is None or np is None:
+    def _start_visualizer(self, pos=None):
+        # the window is kept around once closed; a hidden one needs no decoder
+        if self.vis_win is None or not self.vis_win.isVisible() or pg is None or np is None:
             return
         if not self.current_file:
             return
-        if self.vis_thread:
-            self.vis_thread.stop()
-            self.vis_thread.wait()
-        self.vis_thread = VisualizerThread(Path(self.current_file), self.player.get_time())
-        self.vis_thread.level.connect(self.vis_win.widget.add_level)
-        self.vis_thread.start()
-
-    def _stop_vis_thread(self):
-        if self.vis_thread:
-            self.vis_thread.stop()
-            self.vis_thread.wait()
-            self.vis_thread = None
+        if self.vis_proc is None:
+            self.vis_proc = VisualizerProcess()
+        self.vis_win.widget.attach_ring(self.vis_proc.ring)
+        self.vis_proc.play(self.play_path, self.player.get_time() if pos is None else pos)
+
+    def _stop_visualizer(self):
+        if self.vis_proc:
+            self.vis_proc.stop()
+
+    def _close_visualizer(self):
+        if self.vis_win:
+            self.vis_win.widget.detach_ring()
+            self.vis_win.widget.timer.stop()
+        if self.vis_proc:
+            self.vis_proc.close()
+            self.vis_proc = None
 
     def open_settings(self):
         dlg = QtWidgets.QDialog(self)
@@ -881,28 +3114,15 @@ class Player(QtWidgets.QMainWindow):
         layout = QtWidgets.QVBoxLayout(dlg)
 
         for txt, fn in [("Wipe All Data", self._wipe_data),
-                        ("View All Data", None),
-                        ("Export All Data", None),
-                        ("Import All Data", None)]:
+                        ("View All Data", self.view_all_data),
+                        ("Export All Data", self.export_all_data),
+                        ("Import All Data", self.import_all_data),
+                        ("Relocate Library…", self.relocate_library)]:
             btn = QtWidgets.QPushButton(txt)
             layout.addWidget(btn)
             if fn:
                 btn.clicked.connect(fn)
 
-        chk = QtWidgets.QCheckBox("Decrypt and show all data")
-        chk.setChecked(True)
-        txtbox = QtWidgets.QTextEdit()
-        txtbox.setReadOnly(True)
-        layout.addWidget(chk)
-        layout.addWidget(txtbox)
-        layout.itemAt(1).widget().clicked.connect(
-            lambda: txtbox.setText(
-                json.dumps(self.resume_db, indent=2)
-                if chk.isChecked()
-                else RESUME_DB.read_bytes().decode(errors='ignore')
-            )
-        )
-
         layout.addWidget(QtWidgets.QLabel("UI Settings:"))
         btn_spin = QtWidgets.QSpinBox(); btn_spin.setRange(6,32); btn_spin.setValue(self.resume_db['ui_btn_size'])
         lbl_spin = QtWidgets.QSpinBox(); lbl_spin.setRange(6,32); lbl_spin.setValue(self.resume_db['ui_title_size'])
@@ -911,23 +3131,623 @@ class Player(QtWidgets.QMainWindow):
         btn_spin.valueChanged.connect(lambda v: (self.resume_db.__setitem__('ui_btn_size', v), save_resume(self.resume_db), self._apply_font_sizes()))
         lbl_spin.valueChanged.connect(lambda v: (self.resume_db.__setitem__('ui_title_size', v), save_resume(self.resume_db), self._apply_font_sizes()))
 
+        layout.addWidget(QtWidgets.QLabel("Local Cache:"))
+        cache_chk = QtWidgets.QCheckBox("Copy books to local disk for playback")
+        cache_chk.setChecked(bool(self.resume_db.get('cache_enabled')))
+        layout.addWidget(cache_chk)
+        budget_spin = QtWidgets.QSpinBox(); budget_spin.setRange(256, 1 << 20); budget_spin.setSingleStep(1024)
+        budget_spin.setValue(self.resume_db.get('cache_budget_mb', 4096))
+        ahead_spin = QtWidgets.QSpinBox(); ahead_spin.setRange(0, 10); ahead_spin.setValue(self.resume_db.get('cache_prefetch', 0))
+        r3 = QtWidgets.QHBoxLayout(); r3.addWidget(QtWidgets.QLabel("Cache size (MB):")); r3.addWidget(budget_spin); layout.addLayout(r3)
+        r4 = QtWidgets.QHBoxLayout(); r4.addWidget(QtWidgets.QLabel("Also cache next books:")); r4.addWidget(ahead_spin); layout.addLayout(r4)
+        cache_chk.toggled.connect(lambda v: self._set_cache_option('cache_enabled', v))
+        budget_spin.editingFinished.connect(lambda: self._set_cache_option('cache_budget_mb', budget_spin.value()))
+        ahead_spin.valueChanged.connect(lambda v: self._set_cache_option('cache_prefetch', v))
+
+        res_btn = QtWidgets.QPushButton("Show Resources")
+        res_btn.clicked.connect(self.show_resources)
+        layout.addWidget(res_btn)
+
         dlg.exec()
+        dlg.deleteLater()
+
+    def view_all_data(self):
+        dlg = DataViewDialog(self)
+        dlg.exec()
+        dlg.deleteLater()
+
+    def show_resources(self):
+        lines = [f"{k}: {v}" for k, v in sorted(RESOURCES.report().items())]
+        lines += ["", "Background jobs:"] + [f"{k}: {v}" for k, v in self.jobs.metrics().items()]
+        QtWidgets.QMessageBox.information(self, "Live Resources", "\n".join(lines))
+
+    def export_all_data(self):
+        ask = QtWidgets.QMessageBox(self)
+        ask.setWindowTitle("Export All Data")
+        ask.setText("Export everything, or only what changed since an earlier export?")
+        full = ask.addButton("Everything", QtWidgets.QMessageBox.ButtonRole.AcceptRole)
+        delta = ask.addButton("Changes Since…", QtWidgets.QMessageBox.ButtonRole.ActionRole)
+        ask.addButton(QtWidgets.QMessageBox.StandardButton.Cancel)
+        ask.exec()
+        clicked = ask.clickedButton()
+        ask.deleteLater()
+        since = 0
+        if clicked is delta:
+            prev, _ = QtWidgets.QFileDialog.getOpenFileName(
+                self, "Previous Export", "", "Player data (*.jsonl.gz)")
+            if not prev:
+                return
+            try:
+                since = read_export_header(prev)['created']
+            except (OSError, ValueError) as exc:
+                QtWidgets.QMessageBox.warning(self, "Export All Data", str(exc))
+                return
+        elif clicked is not full:
+            return
+        name = f"m4bplayer-{datetime.datetime.now():%Y%m%d-%H%M%S}.jsonl.gz"
+        dest, _ = QtWidgets.QFileDialog.getSaveFileName(
+            self, "Export All Data", str(HOME / name), "Player data (*.jsonl.gz)")
+        if not dest:
+            return
+        if self.current_book:
+            set_position(self.resume_db, self.current_book, self.player.get_time())
+        try:
+            count = export_data(self.resume_db, dest, self.sessions, since)
+        except OSError as exc:
+            QtWidgets.QMessageBox.warning(self, "Export All Data", str(exc))
+            return
+        QtWidgets.QMessageBox.information(self, "Export All Data", f"Exported {count} records.")
+
+    def import_all_data(self):
+        src, _ = QtWidgets.QFileDialog.getOpenFileName(
+            self, "Import All Data", "", "Player data (*.jsonl.gz)")
+        if not src:
+            return
+        try:
+            stats = import_data(self.resume_db, src, self.sessions)
+        except (OSError, ValueError, KeyError) as exc:
+            QtWidgets.QMessageBox.warning(self, "Import All Data", f"Import failed: {exc}")
+            return
+        self.books = BookIndex(self.resume_db, self.sessions)
+        save_resume(self.resume_db)
+        self._refresh_shelf()
+        self._apply_font_sizes()
+        summary = ", ".join(f"{n} {k}" for k, n in stats.items()) or "nothing new"
+        QtWidgets.QMessageBox.information(self, "Import All Data", f"Imported {summary}.")
 
     def _wipe_data(self):
-        self.resume_db = {'__bookshelf__': [], 'ui_btn_size': 10, 'ui_title_size': 12, 'volume': 100}
+        self.resume_db = {'__bookshelf__': [], '__queue__': [], 'ui_btn_size': 10, 'ui_title_size': 12, 'volume': 100}
+        self.books = BookIndex(self.resume_db, self.sessions)
+        if self.current_file:
+            self.current_book = self.books.identify(self.current_file)
+        self._span = None
+        self.sessions.clear()
+        if self.player.is_playing():
+            self._begin_span()
+        shutil.rmtree(ENVELOPE_DIR, ignore_errors=True)
+        self._envelope = (None, None)
         save_resume(self.resume_db)
         self._refresh_shelf()
         self._apply_font_sizes()
 
     def closeEvent(self, e):
+        self._end_span()
+        self.sessions.close()
+        self._drop_prepared()
+        self.jobs.shutdown()
         if self.current_file:
-            self.resume_db[self.current_file] = self.player.get_time()
-            self.resume_db['__last_book__'] = self.current_file
+            set_position(self.resume_db, self.current_book, self.player.get_time())
+            self.resume_db['__last_book__'] = self.current_book
             save_resume(self.resume_db)
-        self._stop_vis_thread()
+        self._close_visualizer()
+        self.ui_timer.stop()
+        self.scrub_timer.stop()
+        self.player.stop()
+        RESOURCES.release_player(self.player)
         super().closeEvent(e)
 
+# --- Benchmarks -----------------------------------------------------------
+
+BENCHMARKS = {}
+
+def benchmark(name):
+    """Register a function in the ``--benchmark`` suite."""
+    def deco(fn):
+        BENCHMARKS[name] = fn
+        return fn
+    return deco
+
+@benchmark('sessions')
+def bench_sessions(args):
+    """Append cost and aggregation time over ten years of listening."""
+    import random
+    rng = random.Random(1)
+    with tempfile.TemporaryDirectory() as tmp:
+        log = SessionLog(Path(tmp) / 'sessions.log', Path(tmp) / 'sessions.books')
+        books = [f'/books/book{i:03d}.m4b' for i in range(200)]
+        n = 100_000
+        day0 = time.time() - 10 * 365 * 86400
+        t0 = time.perf_counter()
+        for i in range(n):
+            start = rng.randrange(0, 20 * 3600_000)
+            log.append(books[i % len(books)], start, start + rng.randrange(1000, 3600_000),
+                       1.0, day0 + i * 3153.6)
+        append_us = (time.perf_counter() - t0) / n * 1e6
+        log.close()
+        print(f"sessions: append {append_us:.1f} us/record, "
+              f"{log.log_path.stat().st_size / 1e6:.1f} MB for {n} spans")
+        for label, fn in [('per book', log.totals_by_book),
+                          ('per day', log.totals_by_day),
+                          ('coverage', lambda: log.coverage(books[0], list(range(0, 20 * 3600_000, 600_000))))]:
+            t0 = time.perf_counter()
+            fn()
+            print(f"sessions: {label} aggregation {(time.perf_counter() - t0) * 1000:.1f} ms")
+
+@benchmark('fingerprint')
+def bench_fingerprint(args):
+    """Partial-hash throughput, extrapolated to a 10 TB library."""
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.bench_dir:
+            files = [os.path.join(r, n) for r, _, names in os.walk(args.bench_dir)
+                     for n in names if n.lower().endswith(AUDIO_EXTS)]
+            cache_note = "page cache state unknown; drop caches first for a cold run"
+        else:
+            # copies of a real m4b so the duration probe parses actual atoms
+            files = []
+            if shutil.which('ffmpeg'):
+                src = make_fixture_book(Path(tmp) / 'fixture.m4b', seconds=3600)
+            else:
+                src = Path(tmp) / 'fixture.m4b'
+                with open(src, 'wb') as f:
+                    for _ in range(16):
+                        f.write(os.urandom(1 << 20))
+            for i in range(32):
+                p = Path(tmp) / f'book{i:02d}.m4b'
+                shutil.copyfile(src, p)
+                files.append(str(p))
+            cache_note = "files just written, so the page cache is warm"
+        if not files:
+            print("fingerprint: no audio files found")
+            return
+        total = sum(os.path.getsize(p) for p in files)
+        t0 = time.perf_counter()
+        for p in files:
+            fingerprint(p)
+        dt = time.perf_counter() - t0
+        avg = total / len(files)
+        per_file = dt / len(files)
+        lib_files = 10e12 / avg
+        print(f"fingerprint: {len(files)} files, {total / 1e9:.2f} GB in {dt * 1000:.0f} ms "
+              f"({len(files) / dt:.0f} files/s, {total / dt / 1e9:.1f} GB/s logical), "
+              f"duration probe included, {cache_note}")
+        print(f"fingerprint: 10 TB of {avg / 1e6:.0f} MB books = {lib_files:.0f} files "
+              f"≈ {lib_files * per_file:.0f} s")
+
+@benchmark('cache')
+def bench_cache(args):
+    """Copy from a throttled folder standing in for a NAS, with resume and eviction."""
+    rate = 64 << 20
+    with tempfile.TemporaryDirectory() as tmp:
+        nas = Path(tmp) / 'nas'
+        nas.mkdir()
+        books = []
+        for i in range(3):
+            p = nas / f'book{i}.m4b'
+            p.write_bytes(os.urandom(24 << 20))
+            books.append((f'id{i}', str(p)))
+        cache = BookCache(Path(tmp) / 'cache', budget=50 << 20)
+        bid, src = books[0]
+        part = cache.begin(bid, src)
+        t0 = time.perf_counter()
+        copy_chunked(src, part, chunk=1 << 20, throttle_bps=rate,
+                     stop=lambda: os.path.getsize(part) >= (8 << 20))
+        t1 = time.perf_counter()
+        copy_chunked(src, part, chunk=1 << 20, throttle_bps=rate)
+        t2 = time.perf_counter()
+        cache.complete(bid)
+        same = cache.local_path(bid).read_bytes() == Path(src).read_bytes()
+        print(f"cache: 8 MB before interruption in {(t1 - t0) * 1000:.0f} ms, "
+              f"resumed remaining 16 MB in {(t2 - t1) * 1000:.0f} ms at {rate >> 20} MB/s cap, identical={same}")
+        for bid, src in books[1:]:
+            part = cache.begin(bid, src)
+            cache.make_room(bid)
+            copy_chunked(src, part)
+            cache.complete(bid)
+        print(f"cache: after caching 3 x 24 MB under a 50 MB budget: "
+              f"{sorted(cache.index)} kept, {cache.usage() >> 20} MB used")
+
+def make_fixture_book(path, chapters=10, seconds=60, ffmpeg=None, speech=False, streams=1):
+    """Generate a test m4b with chapter marks, cover art and ``streams`` audio tracks.
+
+    The audio is a sine tone, or with ``speech`` pink noise gated on and off
+    at random like speech, which gives loudness envelopes something to match.
+    """
+    ff = ffmpeg or shutil.which('ffmpeg')
+    path = Path(path)
+    meta = path.with_suffix('.ffmeta')
+    step = seconds * 1000 // chapters
+    lines = [';FFMETADATA1', f'title={path.stem}', 'artist=Fixture']
+    for i in range(chapters):
+        lines += ['[CHAPTER]', 'TIMEBASE=1/1000', f'START={i * step}',
+                  f'END={(i + 1) * step if i < chapters - 1 else seconds * 1000}',
+                  f'title=Chapter {i + 1}']
+    meta.write_text('\n'.join(lines) + '\n')
+    cover = path.with_suffix('.jpg')
+    subprocess.run([ff, '-y', '-loglevel', 'error', '-f', 'lavfi', '-i', 'color=c=navy:s=300x300:d=1',
+                    '-frames:v', '1', str(cover)], check=True)
+    source = f'sine=frequency=220:sample_rate=22050:duration={seconds}'
+    if speech:
+        source = (f"anoisesrc=color=pink:sample_rate=22050:duration={seconds}:seed=7,"
+                  "volume=eval=frame:volume='0.05+0.9*gt(random(0),0.45)'")
+    cmd = [ff, '-y', '-loglevel', 'error', '-f', 'lavfi', '-i', source,
+           '-i', str(cover), '-i', str(meta)]
+    cmd += ['-map', '0:a'] * streams
+    cmd += ['-map', '1:v', '-map_metadata', '2', '-map_chapters', '2',
+            '-c:a', 'aac', '-b:a', '32k', '-c:v', 'copy', '-disposition:v', 'attached_pic',
+            '-f', 'mp4', str(path)]
+    subprocess.run(cmd, check=True)
+    meta.unlink()
+    cover.unlink()
+    return path
+
+@benchmark('export')
+def bench_export(args):
+    """Split a generated 300-chapter book serially and across all cores."""
+    if not shutil.which('ffmpeg'):
+        print("export: ffmpeg not found, skipped")
+        return
+    with tempfile.TemporaryDirectory() as tmp:
+        src = make_fixture_book(Path(tmp) / 'book.m4b', chapters=300, seconds=3600)
+        step = 3600_000 // 300
+        chapters = [{'start': i * step, 'end': (i + 1) * step, 'title': f'Chapter {i + 1}'}
+                    for i in range(300)]
+        for workers in sorted({1, os.cpu_count() or 1}):
+            t0 = time.perf_counter()
+            written, errors = export_chapters(src, Path(tmp) / f'out{workers}', chapters, workers)
+            dt = time.perf_counter() - t0
+            print(f"export: {len(written)} chapters with {workers} worker(s) in {dt:.2f} s "
+                  f"({len(written) / dt:.0f} chapters/s, {len(errors)} errors)")
+
+@benchmark('align')
+def bench_align(args):
+    """Align a generated hour-long book with a trimmed, spliced MP3 edition of it."""
+    if np is None or not shutil.which('ffmpeg'):
+        print("align: numpy or ffmpeg not found, skipped")
+        return
+    trim, splice, gap = 45, 1800, 20
+    with tempfile.TemporaryDirectory() as tmp:
+        a = make_fixture_book(Path(tmp) / 'book.m4b', seconds=3600, speech=True)
+        b = Path(tmp) / 'book.mp3'
+        graph = (f"[0:a]asplit[x][y];[x]atrim={trim}:{splice},asetpts=PTS-STARTPTS[p];"
+                 f"[1:a]atrim=0:{gap}[s];[y]atrim=start={splice},asetpts=PTS-STARTPTS[q];"
+                 "[p][s][q]concat=n=3:v=0:a=1[out]")
+        subprocess.run(['ffmpeg', '-y', '-loglevel', 'error', '-i', str(a),
+                        '-f', 'lavfi', '-i', 'anullsrc=r=22050:cl=mono', '-filter_complex', graph,
+                        '-map', '[out]', '-c:a', 'libmp3lame', '-b:a', '48k', str(b)], check=True)
+        t0 = time.perf_counter()
+        env_a = loudness_envelope(a)
+        env_b = loudness_envelope(b)
+        t1 = time.perf_counter()
+        anchors = align_envelopes(env_a, env_b)
+        t2 = time.perf_counter()
+        # the player runs the correlation as a process job; check that path agrees
+        jobs = JobScheduler(workers=2)
+        job = jobs.submit(align_envelopes, env_a, env_b, process=True)
+        job.wait()
+        jobs.shutdown()
+        t3 = time.perf_counter()
+        if job.error is not None or job.result != anchors:
+            print(f"align: process pool result differs from in-process ({job.error!r})")
+        db = {}
+        store_alignment(db, 'a', 'b', anchors)
+        errors = []
+        for s in range(trim + 60, 3600 - 60, 60):
+            if abs(s - splice) <= 60:
+                continue
+            truth = (s - trim + (gap if s >= splice else 0)) * 1000
+            errors.append(abs(translate_position(db, 'a', 'b', s * 1000) - truth))
+        hours = (len(env_a) + len(env_b)) / ENVELOPE_RATE / 3600
+        print(f"align: envelopes of {hours:.1f} h of audio in {t1 - t0:.2f} s "
+              f"({hours * 3600 / (t1 - t0):.0f}x real time), correlation in {(t2 - t1) * 1000:.0f} ms "
+              f"({(t3 - t2) * 1000:.0f} ms as a process job, pool start-up included)")
+        print(f"align: {len(anchors)} anchors, translation error median "
+              f"{sorted(errors)[len(errors) // 2]} ms, max {max(errors)} ms")
+        print(f"align: two 20 h editions would take about {40 / hours * (t2 - t0):.1f} s")
+
+@benchmark('seek')
+def bench_seek(args):
+    """Seek-to-audio latency in VLC, and a fast slider drag with and without coalescing."""
+    import random
+    try:
+        inst = vlc.Instance('--no-video', '--aout=dummy', '--quiet')
+    except Exception:
+        inst = None
+    if inst is None or not shutil.which('ffmpeg'):
+        print("seek: libvlc or ffmpeg not found, skipped")
+        return
+    rng = random.Random(1)
+    with tempfile.TemporaryDirectory() as tmp:
+        book = make_fixture_book(Path(tmp) / 'book.m4b', chapters=30, seconds=3600)
+        mp = inst.media_player_new()
+        media = inst.media_new(str(book))
+        mp.set_media(media)
+        media.release()
+        mp.play()
+
+        def audio_at(target, timeout=5.0):
+            """Seconds until playback has moved on from ``target``."""
+            t0 = time.perf_counter()
+            while time.perf_counter() - t0 < timeout:
+                if target < mp.get_time() < target + 2000:
+                    return time.perf_counter() - t0
+                time.sleep(0.001)
+            return math.nan
+
+        audio_at(0)
+        lat = []
+        for _ in range(20):
+            target = rng.randrange(60_000, 3_500_000)
+            mp.set_time(target)
+            lat.append(audio_at(target) * 1000)
+        lat.sort()
+        print(f"seek: single seek to audio p50 {lat[len(lat) // 2]:.0f} ms, max {lat[-1]:.0f} ms")
+
+        # 300 slider moves across the book in 1.5 s, then release
+        path = [int(3_500_000 * i / 300) for i in range(300)]
+        for name, coalesce in (("every move", False), ("coalesced", True)):
+            throttle = SeekThrottle(mp.set_time, SCRUB_SEEK_MS if coalesce else 0)
+            t0 = time.perf_counter()
+            for ms in path:
+                throttle.move(ms)
+                time.sleep(0.005)
+            throttle.flush()
+            release = time.perf_counter()
+            settle = audio_at(path[-1])
+            print(f"seek: drag {name}: {throttle.seeks} seeks reached VLC, audio "
+                  f"{settle * 1000:.0f} ms after release ({release - t0:.2f} s drag)")
+            mp.set_time(0)
+            audio_at(0)
+        mp.stop()
+        mp.release()
+        inst.release()
+
+def run_benchmarks(args):
+    names = args.benchmark or sorted(BENCHMARKS)
+    for name in names:
+        if name not in BENCHMARKS:
+            print(f"Unknown benchmark '{name}'. Available: {', '.join(sorted(BENCHMARKS))}")
+            return 1
+        BENCHMARKS[name](args)
+    return 0
+
+# --- Soak test ------------------------------------------------------------
+
+# growth per hour allowed once the player has warmed up
+SOAK_LIMITS = {'rss_mb': 20.0, 'fds': 10.0, 'threads': 4.0, 'children': 1.0, 'db_kb': 64.0}
+
+def soak_driver(args):
+    """Child side of ``--soak``: drive a headless player through scripted loops."""
+    import random
+    import traceback
+    rng = random.Random(1)
+    work = Path(args.soak_driver)
+    books = [make_fixture_book(work / f"book{i}.m4b", chapters=12, seconds=900, speech=True, streams=2)
+             for i in range(3)]
+    app = QtWidgets.QApplication(sys.argv[:1])
+    player = Player(vlc.Instance('--no-video', '--aout=dummy', '--quiet'), shutil.which('ffprobe'))
+    player.show()
+
+    def open_book():
+        player.load_media(rng.choice(books), autoplay=rng.random() < 0.7)
+
+    def seek():
+        player.seek(rng.randrange(max(1, player.player.get_length())))
+
+    def play_pause():
+        if player.current_file:
+            player.play_pause()
+
+    def visualizer():
+        if player.vis_win and player.vis_win.isVisible():
+            player.vis_win.close()
+        else:
+            player.open_visualizer()
+
+    def answer_note():
+        box = app.activeModalWidget()
+        if isinstance(box, QtWidgets.QInputDialog):
+            box.setTextValue('soak')
+            box.accept()
+        else:
+            QtCore.QTimer.singleShot(50, answer_note)
+
+    def bookmark():
+        if not player.current_file:
+            return
+        # the same dialog and buttons a user goes through
+        dlg = BookmarkDialog(player)
+        dlg.show()
+        QtCore.QTimer.singleShot(0, answer_note)
+        dlg.add_bookmark()
+        # old ones get deleted too, so the data file should level off
+        extra = dlg.table.rowCount() - 20
+        if extra > 0:
+            dlg.table.setRangeSelected(QtWidgets.QTableWidgetSelectionRange(0, 0, extra - 1, 2), True)
+            dlg.delete_selected()
+        dlg.close()
+        dlg.deleteLater()
+
+    def switch_stream():
+        n = player.stream_combo.count()
+        if n > 1:
+            player.stream_combo.setCurrentIndex((player.stream_combo.currentIndex() + 1) % n)
+
+    script = itertools.cycle([open_book, seek, play_pause, visualizer, seek, bookmark,
+                              switch_stream, seek, play_pause, visualizer])
+
+    busy = False
+
+    def step():
+        # the note prompt runs a nested event loop; don't start another step inside it
+        nonlocal busy
+        if busy:
+            return
+        busy = True
+        try:
+            next(script)()
+        except Exception:
+            traceback.print_exc()
+            app.exit(1)
+        finally:
+            busy = False
+
+    timer = QtCore.QTimer()
+    timer.timeout.connect(step)
+    timer.start(300)
+
+    def finish():
+        timer.stop()
+        player.close()
+        app.quit()
+
+    QtCore.QTimer.singleShot(int(args.soak * 60000), finish)
+    return app.exec()
+
+def soak_sample(proc, db):
+    """One reading of the driven player's resource use."""
+    return {'rss_mb': proc.memory_info().rss / 2**20,
+            'fds': proc.num_fds() if hasattr(proc, 'num_fds') else proc.num_handles(),
+            'threads': proc.num_threads(),
+            'children': len(proc.children(recursive=True)),
+            'db_kb': db.stat().st_size / 1024 if db.exists() else 0}
+
+def _slope(xs, ys):
+    mx, my = sum(xs) / len(xs), sum(ys) / len(ys)
+    var = sum((x - mx) ** 2 for x in xs)
+    return sum((x - mx) * (y - my) for x, y in zip(xs, ys)) / var if var else 0.0
+
+def soak_cli(args):
+    """``--soak``: run a headless player for a while and fail on steady resource growth.
+
+    The player runs in a child process with its own temporary config
+    folder, offscreen Qt and VLC's dummy audio output, while this process
+    samples it from outside. After the first fifth of the run (warm-up) a
+    least-squares slope per hour is fitted to every series and compared
+    with ``SOAK_LIMITS`` / ``--soak-limit``.
+    """
+    if psutil is None or not shutil.which('ffmpeg'):
+        print("--soak needs psutil and ffmpeg", file=sys.stderr)
+        return 1
+    limits = dict(SOAK_LIMITS)
+    for item in args.soak_limit or []:
+        name, _, value = item.partition('=')
+        if name not in limits:
+            print(f"Unknown soak limit '{name}'. Available: {', '.join(limits)}", file=sys.stderr)
+            return 1
+        limits[name] = float(value)
+    samples = []
+    with tempfile.TemporaryDirectory() as tmp:
+        config = Path(tmp) / 'config'
+        env = dict(os.environ, M4BPLAYER_CONFIG_DIR=str(config), QT_QPA_PLATFORM='offscreen')
+        cmd = [sys.executable] + ([] if getattr(sys, 'frozen', False) else [str(Path(__file__).resolve())])
+        child = subprocess.Popen(cmd + ['--soak', str(args.soak), '--soak-driver', tmp], env=env)
+        proc = psutil.Process(child.pid)
+        t0 = time.monotonic()
+        print("minutes  " + "  ".join(f"{k:>9}" for k in limits))
+        try:
+            while child.poll() is None:
+                time.sleep(args.soak_interval)
+                if child.poll() is not None:
+                    break
+                try:
+                    s = soak_sample(proc, config / 'resume.dat')
+                except psutil.Error:
+                    break
+                s['hours'] = (time.monotonic() - t0) / 3600
+                samples.append(s)
+                print(f"{s['hours'] * 60:7.1f}  " + "  ".join(f"{s[k]:9.1f}" for k in limits), flush=True)
+        except KeyboardInterrupt:
+            child.terminate()
+        code = child.wait()
+    if code:
+        print(f"soak: player exited with status {code}")
+    steady = samples[len(samples) // 5:]
+    if len(steady) < 3:
+        print("soak: too few samples to judge growth")
+        return 1
+    failed = bool(code)
+    for name, limit in limits.items():
+        slope = _slope([s['hours'] for s in steady], [s[name] for s in steady])
+        ok = slope <= limit
+        failed |= not ok
+        print(f"soak: {name:8} {slope:+9.2f}/h  (limit {limit:g}/h)  {'ok' if ok else 'FAIL'}")
+    return 1 if failed else 0
+
+def export_cli(args):
+    """``--export-chapters``: split a book into chapter files from the shell."""
+    probe = shutil.which('ffprobe')
+    if not probe:
+        print("ffprobe not found", file=sys.stderr)
+        return 1
+    src = Path(args.export_chapters)
+    try:
+        chapters = probe_chapters(probe, src)
+    except (OSError, subprocess.CalledProcessError, ValueError) as exc:
+        print(f"Could not read chapters: {exc}", file=sys.stderr)
+        return 1
+    if not chapters:
+        print("No chapters found", file=sys.stderr)
+        return 1
+    out_dir = Path(args.out or _safe_name(src.stem))
+
+    def report(done, total, size, secs):
+        print(f"\r{done}/{total} chapters  {size/1e6:.1f} MB  {size/1e6/max(secs, 1e-3):.1f} MB/s",
+              end='', flush=True)
+
+    cancel = threading.Event()
+    try:
+        written, errors = export_chapters(src, out_dir, chapters, args.jobs, report, cancel)
+    except KeyboardInterrupt:
+        cancel.set()
+        print("\nCancelled")
+        return 130
+    print()
+    for err in errors:
+        print(err, file=sys.stderr)
+    print(f"Wrote {len(written)} files to {out_dir}")
+    return 1 if errors else 0
+
+def parse_args(argv):
+    import argparse
+    ap = argparse.ArgumentParser(description="Offline audio book player")
+    ap.add_argument('--benchmark', nargs='*', metavar='NAME',
+                    help="run the benchmark suite (all benchmarks when no name is given)")
+    ap.add_argument('--bench-dir', metavar='DIR',
+                    help="library folder to use instead of generated files")
+    ap.add_argument('--export-chapters', metavar='FILE',
+                    help="split FILE into one file per chapter and exit")
+    ap.add_argument('--out', metavar='DIR', help="output folder for --export-chapters")
+    ap.add_argument('--jobs', type=int, metavar='N',
+                    help="parallel ffmpeg processes (default: CPU count)")
+    ap.add_argument('--soak', type=float, metavar='MINUTES',
+                    help="run a headless soak test for MINUTES and report resource growth")
+    ap.add_argument('--soak-interval', type=float, default=10, metavar='SECONDS',
+                    help="how often --soak samples the player (default: 10)")
+    ap.add_argument('--soak-limit', action='append', metavar='NAME=PER_HOUR',
+                    help="allowed growth per hour, e.g. rss_mb=50 (repeatable)")
+    ap.add_argument('--soak-driver', metavar='DIR', help=argparse.SUPPRESS)
+    args, _ = ap.parse_known_args(argv)
+    return args
+
 if __name__ == '__main__':
+    multiprocessing.freeze_support()
+    args = parse_args(sys.argv[1:])
+    if args.benchmark is not None:
+        sys.exit(run_benchmarks(args))
+    if args.export_chapters:
+        sys.exit(export_cli(args))
+    if args.soak is not None:
+        sys.exit(soak_driver(args) if args.soak_driver else soak_cli(args))
     app = QtWidgets.QApplication(sys.argv)
     app.setStyleSheet("""
         QSlider#timeSlider::groove:horizontal { height: 8px; }